@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+
+import pyarrow as pa
+
+from spill import as_frame
+
+CATALOG_FILE = '_catalog.json'
+DEFAULT_PARTITION_BY = ('season', 'round')
+
+def to_arrow(df):
+    """Convert a table to Arrow, stringifying object columns that mix types"""
+    arrays = []
+    for name in df.columns:
+        try:
+            arrays.append(pa.array(df[name], from_pandas=True))
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            arrays.append(pa.array(df[name].map(lambda v: v if v is None else str(v)),
+                                   type=pa.string(), from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns])
+
+def partition_keys(result, partition_by):
+    """Partition values per row for every table that can be partitioned.
+
+    A table carrying the partition columns is split on them directly; a
+    child table inherits the partition of the parent its foreign key points
+    to. Tables shared across partitions (dimensions) stay unpartitioned.
+    """
+    tables = result['tables']
+    keys = {}
+    for name, df in tables.items():
+        if all(column in df.columns for column in partition_by):
+            keys[name] = df[list(partition_by)].astype(str)
+
+    resolved = True
+    while resolved:
+        resolved = False
+        for relationship in result['relationships']:
+            parent, child, foreign_key = (relationship['parent'], relationship['child'],
+                                          relationship['foreign_key'])
+            if child in keys or parent not in keys or child not in tables:
+                continue
+            df = tables[child]
+            if foreign_key not in df.columns:
+                continue
+            parent_keys = keys[parent].set_index(tables[parent]['id'].to_numpy())
+            child_keys = parent_keys.reindex(df[foreign_key].to_numpy())
+            # Tables whose rows hang off several parents stay unpartitioned
+            if child_keys.isna().any().any():
+                continue
+            keys[child] = child_keys.reset_index(drop=True)
+            resolved = True
+    return keys
+
+def write_table(table, directory):
+    """Append an Arrow table as a new uncompressed IPC file in directory"""
+    os.makedirs(directory, exist_ok=True)
+    part = sum(1 for f in os.listdir(directory) if f.endswith('.arrow'))
+    with pa.OSFile(os.path.join(directory, f'part-{part}.arrow'), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def write_dataset(result, root, partition_by=DEFAULT_PARTITION_BY, mode='overwrite'):
+    """Persist every table of a result as a partitioned Arrow dataset.
+
+    Layout: root/<table>/<col>=<value>/.../part-N.arrow, plus a catalog with
+    the relationships and each table's partition columns. Files are Arrow
+    IPC without compression so they can be memory-mapped and read without
+    copying.
+    """
+    if mode not in ('overwrite', 'append'):
+        raise ValueError(f"Unknown write mode: {mode}")
+    partition_by = tuple(partition_by)
+    keys = partition_keys(result, partition_by) if partition_by else {}
+    catalog = {'relationships': result['relationships'], 'tables': {}}
+
+    for name, df in result['tables'].items():
+        table_dir = os.path.join(root, name)
+        if mode == 'overwrite' and os.path.isdir(table_dir):
+            shutil.rmtree(table_dir)
+
+        # A spilled table is loaded here, one table at a time
+        table = to_arrow(as_frame(df))
+        if name not in keys:
+            write_table(table, table_dir)
+            catalog['tables'][name] = {'partition_by': []}
+            continue
+
+        catalog['tables'][name] = {'partition_by': list(partition_by)}
+        groups = keys[name].groupby(list(partition_by), sort=True).indices
+        for values, indices in groups.items():
+            values = values if isinstance(values, tuple) else (values,)
+            parts = [f'{column}={value}' for column, value in zip(partition_by, values)]
+            write_table(table.take(indices), os.path.join(table_dir, *parts))
+
+    if mode == 'append':
+        previous = read_catalog(root)
+        for relationship in previous.get('relationships', []):
+            if relationship not in catalog['relationships']:
+                catalog['relationships'].append(relationship)
+        catalog['tables'] = {**previous.get('tables', {}), **catalog['tables']}
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, CATALOG_FILE), 'w') as f:
+        json.dump(catalog, f, indent=2)
+
+def read_catalog(root):
+    """Relationships and partition layout of a dataset"""
+    try:
+        with open(os.path.join(root, CATALOG_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def partition_files(table_dir, filters=None):
+    """IPC files of a table whose partition directories match filters"""
+    filters = {k: str(v) for k, v in (filters or {}).items()}
+    files = []
+    for directory, subdirs, names in os.walk(table_dir):
+        relative = os.path.relpath(directory, table_dir)
+        values = dict(part.split('=', 1) for part in relative.split(os.sep) if '=' in part)
+        if any(values.get(k, v) != v for k, v in filters.items()):
+            subdirs[:] = []
+            continue
+        subdirs.sort()
+        files.extend(os.path.join(directory, f) for f in sorted(names) if f.endswith('.arrow'))
+    return files
+
+def open_table(root, name, columns=None, filters=None):
+    """Memory-map one table, reading only the requested columns and partitions.
+
+    The returned Arrow table references the mapped files directly; pages are
+    only read from disk when their data is touched. filters such as
+    {'season': 2024} prune partition directories; unpartitioned tables are
+    returned whole.
+    """
+    tables = []
+    for path in partition_files(os.path.join(root, name), filters):
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        tables.append(table.select(columns) if columns else table)
+    if not tables:
+        return None
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+def open_dataset(root, tables=None, columns=None, filters=None):
+    """Open several tables at once; columns maps table name to the columns to read"""
+    catalog = read_catalog(root)
+    names = tables or list(catalog.get('tables', {}))
+    columns = columns or {}
+    opened = {}
+    for name in names:
+        table = open_table(root, name, columns.get(name), filters)
+        if table is not None:
+            opened[name] = table
+    return {'tables': opened, 'relationships': catalog.get('relationships', [])}
@@ -0,0 +1,170 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import json_backend
+from compiler_5 import RelationalProcessor, fetch_api_body
+from http_cache import ResponseCache
+from pagination import fetch_all_pages, create_session
+
+DEFAULT_CATALOG = 'endpoints.jsonl'
+
+def load_catalog(path=DEFAULT_CATALOG):
+    """Read endpoints from JSONL: {"name": ..., "url": ...} objects or bare URL strings"""
+    endpoints = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {'url': entry}
+            entry.setdefault('name', entry['url'])
+            endpoints.append(entry)
+    return endpoints
+
+def fetch_endpoint(endpoint, paginate=False, cache=None, session=None):
+    """Fetch one endpoint, returning its payload and the time taken"""
+    start = time.perf_counter()
+    if paginate:
+        payload = fetch_all_pages(endpoint['url'], session=session, cache=cache)
+    else:
+        payload = fetch_api_body(endpoint['url'], cache, session=session)
+    return payload, time.perf_counter() - start
+
+def compile_document(payload, normalize=False):
+    """Process pool worker: decode one document and convert it to tables"""
+    start = time.perf_counter()
+    raw_data = json_backend.loads(payload) if isinstance(payload, bytes) else payload
+    result = RelationalProcessor(normalize=normalize).process_data(raw_data)
+    return result, time.perf_counter() - start
+
+def warm_up():
+    """No-op task that makes a spawned worker import this module ahead of real work"""
+
+def compile_catalog(endpoints, fetch_workers=8, process_workers=None,
+                    paginate=False, normalize=False, cache=None, session=None):
+    """Fetch every endpoint concurrently and convert them in a process pool.
+
+    Each document is handed to the pool as soon as its fetch completes, so
+    fetching and conversion overlap and the total time is bounded by the
+    slowest endpoint rather than the sum of all of them.
+    """
+    import pandas as pd
+    import requests
+
+    start = time.perf_counter()
+    results = {}
+    timings = {
+        endpoint['name']: {
+            'endpoint': endpoint['name'],
+            'url': endpoint['url'],
+            'fetch_seconds': None,
+            'compile_seconds': None,
+            'tables': 0,
+            'rows': 0,
+            'status': 'ok',
+        }
+        for endpoint in endpoints
+    }
+
+    own_session = session is None
+    if own_session:
+        session = create_session(fetch_workers)
+    # Workers are spawned rather than forked because fetch threads are already running
+    pool_context = multiprocessing.get_context('spawn')
+    try:
+        with ThreadPoolExecutor(fetch_workers) as fetchers, \
+                ProcessPoolExecutor(process_workers, mp_context=pool_context) as compilers:
+            # Start the workers while the first fetches are still in flight
+            for _ in range(process_workers or os.cpu_count() or 1):
+                compilers.submit(warm_up)
+            fetches = {
+                fetchers.submit(fetch_endpoint, endpoint, paginate, cache, session): endpoint['name']
+                for endpoint in endpoints
+            }
+            compiles = {}
+            for future in as_completed(fetches):
+                name = fetches[future]
+                results[name] = None
+                try:
+                    payload, timings[name]['fetch_seconds'] = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    timings[name]['status'] = f'fetch failed: {e}'
+                    continue
+                if payload is None:
+                    timings[name]['status'] = 'fetch failed'
+                    continue
+                compiles[compilers.submit(compile_document, payload, normalize)] = name
+
+            for future in as_completed(compiles):
+                name = compiles[future]
+                try:
+                    result, timings[name]['compile_seconds'] = future.result()
+                except Exception as e:
+                    # One malformed endpoint must not sink the rest of the batch
+                    timings[name]['status'] = f'compile failed: {e}'
+                    continue
+                if result is None:
+                    timings[name]['status'] = 'validation failed'
+                    continue
+                results[name] = result
+                timings[name]['tables'] = len(result['tables'])
+                timings[name]['rows'] = sum(len(df) for df in result['tables'].values())
+    finally:
+        if own_session:
+            session.close()
+
+    return {
+        'results': results,
+        'timings': pd.DataFrame(list(timings.values())),
+        'wall_seconds': time.perf_counter() - start,
+    }
+
+def display_batch(batch):
+    """Print per-endpoint timing for a batch run"""
+    print("\n🏁 Batch Results")
+    timings = batch['timings'].drop(columns=['url'])
+    try:
+        from tabulate import tabulate
+        print(tabulate(timings, headers='keys', tablefmt='psql', showindex=False, floatfmt='.3f'))
+    except ImportError:
+        print(timings.to_string(index=False))
+
+    slowest = (batch['timings']['fetch_seconds'].fillna(0) +
+               batch['timings']['compile_seconds'].fillna(0)).max()
+    print(f"\n⏱️ Wall time: {batch['wall_seconds']:.3f}s (slowest endpoint: {slowest:.3f}s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile every endpoint of a catalog in parallel")
+    parser.add_argument('catalog', nargs='?', default=DEFAULT_CATALOG,
+                        help="JSONL file of endpoints")
+    parser.add_argument('--fetch-workers', type=int, default=8)
+    parser.add_argument('--process-workers', type=int, default=None)
+    parser.add_argument('--paginate', action='store_true', help="fetch every page of each endpoint")
+    parser.add_argument('--normalize', action='store_true', help="intern repeated nested objects")
+    parser.add_argument('--cache-dir', default=None, help="cache responses on disk")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="requests per second per host, with retries on throttling")
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache(args.cache_dir) if args.cache_dir else None
+    scheduler = None
+    if args.rate:
+        from scheduler import RequestScheduler, BATCH
+        scheduler = RequestScheduler(rate=args.rate, workers=args.fetch_workers)
+    try:
+        batch = compile_catalog(load_catalog(args.catalog), args.fetch_workers,
+                                args.process_workers, args.paginate, args.normalize, cache,
+                                scheduler.client(BATCH) if scheduler else None)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+    display_batch(batch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+
+from batch import DEFAULT_CATALOG, load_catalog
+
+COMPILERS = ('compiler', 'compiler_2', 'compiler_3', 'compiler_4', 'compiler_5')
+# Checked in next to this script, so runs from any directory find them
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_OUTPUT = 'benchmark.json'
+
+def synthetic_document(depth=3, fanout=2, list_length=5, rows=20, seed=0):
+    """Ergast-shaped nested document with tunable size.
+
+    rows top-level records each carry fanout nested objects and one list of
+    list_length child records, repeated down to depth list levels. Values are
+    strings the way the Ergast API sends them.
+    """
+    rng = random.Random(seed)
+
+    def record(level, index):
+        item = {
+            f'level{level}Id': f'l{level}_{index}',
+            'position': str(index + 1),
+            'points': f'{rng.uniform(0, 25):.1f}',
+            'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'status': rng.choice(('Finished', 'Retired', '+1 Lap')),
+        }
+        for n in range(fanout):
+            item[f'Info{n}'] = {
+                f'info{n}Id': f'i{level}_{n}_{rng.randrange(10)}',
+                'name': f'Name {rng.randrange(50)}',
+                'Location': {'lat': f'{rng.uniform(-90, 90):.4f}',
+                             'long': f'{rng.uniform(-180, 180):.4f}'},
+            }
+        if level + 1 < depth:
+            item[f'Level{level + 1}'] = [record(level + 1, i) for i in range(list_length)]
+        return item
+
+    return {'MRData': {
+        'series': 'f1',
+        'limit': str(rows),
+        'offset': '0',
+        'total': str(rows),
+        'SyntheticTable': {'season': '2024', 'Level0': [record(0, i) for i in range(rows)]},
+    }}
+
+def fixture_name(name):
+    return re.sub(r'[^\w.-]', '_', name)
+
+def record_fixtures(endpoints, fixture_dir=DEFAULT_FIXTURE_DIR, cache=None):
+    """Save live responses of catalog endpoints as JSON fixtures for offline runs"""
+    from compiler_5 import fetch_api_data
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    recorded = []
+    for endpoint in endpoints:
+        data = fetch_api_data(endpoint['url'], cache)
+        if data is None:
+            continue
+        path = os.path.join(fixture_dir, fixture_name(endpoint['name']) + '.json')
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        recorded.append(path)
+    print(f"✅ Recorded {len(recorded)} fixture(s) in {fixture_dir}")
+    return recorded
+
+def fixture_datasets(fixture_dir=DEFAULT_FIXTURE_DIR):
+    """Recorded fixtures as (name, path) pairs"""
+    if not os.path.isdir(fixture_dir):
+        return []
+    return [(f[:-len('.json')], os.path.join(fixture_dir, f))
+            for f in sorted(os.listdir(fixture_dir)) if f.endswith('.json')]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def flat_stages(module, data):
+    """Extraction path of the single-DataFrame compilers, one callable per stage"""
+    state = {}
+
+    def detect():
+        if module.__name__ == 'compiler':
+            state['paths'] = module.find_main_data_property(state['schema'])
+        elif module.__name__ == 'compiler_4':
+            state['paths'] = module.find_all_lists(state['schema'])
+        else:
+            state['paths'] = module.find_all_lists(state['schema']['properties'])
+
+    stages = [
+        ('schema', lambda: state.update(schema=module.generate_schema(data))),
+        ('validate', lambda: module.validate_data(data, state['schema'])),
+        ('detect', detect),
+        ('extract', lambda: state.update(
+            extracted=module.extract_data_from_json(data, state['paths']))),
+        ('frame', lambda: state.update(
+            result=module.convert_to_dataframe(state['extracted']))),
+    ]
+    return stages, lambda: len(state['result'])
+
+def relational_stages(module, data):
+    """RelationalProcessor.process_data split into its stages"""
+    processor = module.RelationalProcessor()
+    state = {}
+    stages = [
+        ('schema', lambda: state.update(schema=module.generate_schema(data))),
+        ('validate', lambda: processor.validate(data, state['schema'])),
+        ('analyze', lambda: processor.analyze_schema(state['schema'])),
+        ('convert', lambda: processor.convert_to_relational(data)),
+        ('structure', lambda: state.update(result=processor.structure_output())),
+    ]
+    return stages, lambda: sum(len(df) for df in state['result']['tables'].values())
+
+def load_dataset(source):
+    if source['kind'] == 'synthetic':
+        return synthetic_document(**source['params'])
+    with open(source['path']) as f:
+        return json.load(f)
+
+def run_case(compiler, source, repeat=3):
+    """Worker: time one compiler on one dataset in a fresh process.
+
+    The best time of repeat runs is kept per stage. Peak RSS is read at the
+    end of the process, so it covers the document and every run.
+    """
+    module = importlib.import_module(compiler)
+    # The compilers import these lazily; load them before the clock starts
+    for dependency in ('pandas', 'genson', 'jsonschema', 'requests'):
+        importlib.import_module(dependency)
+    data = load_dataset(source)
+    baseline_rss = peak_rss_mb()
+    best = {}
+    rows = 0
+    for _ in range(repeat):
+        make_stages = relational_stages if hasattr(module, 'RelationalProcessor') else flat_stages
+        stages, count_rows = make_stages(module, data)
+        # The compilers report progress on stdout; keep it out of the benchmark output
+        with contextlib.redirect_stdout(io.StringIO()):
+            for stage, run in stages:
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                best[stage] = min(best.get(stage, elapsed), elapsed)
+        rows = count_rows()
+
+    seconds = sum(best.values())
+    return {
+        'compiler': compiler,
+        'dataset': source['name'],
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'baseline_rss_mb': baseline_rss,
+        'stages': best,
+        'status': 'ok',
+    }
+
+def run_suite(compilers=COMPILERS, sources=(), repeat=3):
+    """Run every compiler on every dataset, each case in its own spawned process"""
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for source in sources:
+        for compiler in compilers:
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                try:
+                    results.append(pool.apply(run_case, (compiler, source, repeat)))
+                except Exception as e:
+                    # Older compilers do not handle every document shape
+                    results.append({'compiler': compiler, 'dataset': source['name'],
+                                    'status': f'failed: {type(e).__name__}: {e}'})
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+def find_regressions(report, baseline, tolerance=0.1):
+    """Cases whose rows/sec dropped more than tolerance below the baseline report"""
+    previous = {(r['compiler'], r['dataset']): r for r in baseline['results'] if r['status'] == 'ok'}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['compiler'], result['dataset']))
+        if result['status'] != 'ok' or before is None or not before['rows_per_sec']:
+            continue
+        change = result['rows_per_sec'] / before['rows_per_sec'] - 1
+        if change < -tolerance:
+            regressions.append({'compiler': result['compiler'], 'dataset': result['dataset'],
+                                'baseline_rows_per_sec': before['rows_per_sec'],
+                                'rows_per_sec': result['rows_per_sec'], 'change': change})
+    return regressions
+
+def display_report(report):
+    print("\n🏁 Benchmark Results")
+    for r in report['results']:
+        if r['status'] != 'ok':
+            print(f"   {r['compiler']:<11} {r['dataset']:<24} {r['status']}")
+            continue
+        stages = ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in r['stages'].items())
+        print(f"   {r['compiler']:<11} {r['dataset']:<24} {r['rows']:>8} rows "
+              f"{r['rows_per_sec']:>12,.0f} rows/s {r['peak_rss_mb']:>8.1f} MB  {stages}")
+
+class ThrottlingServer:
+    """Local stand-in for a rate-limited API that adds latency to every response.
+
+    Requests beyond limit per second get a 429 with Retry-After, the way
+    Ergast answers bursts.
+    """
+
+    def __init__(self, limit=4, latency=0.05, retry_after=1):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+        self.limit = limit
+        self.latency = latency
+        self.retry_after = retry_after
+        self.window = 0
+        self.window_count = 0
+        self.counts = {'ok': 0, 'throttled': 0}
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = server.admit()
+                body = b'{"MRData": {"total": "1"}}' if status == 200 else b''
+                time.sleep(server.latency)
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', str(server.retry_after))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def admit(self):
+        with self.lock:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window, self.window_count = window, 0
+            self.window_count += 1
+            allowed = self.window_count <= self.limit
+            self.counts['ok' if allowed else 'throttled'] += 1
+            return 200 if allowed else 429
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def run_throttle(requests_count=40, interactive_every=10, server_limit=4, latency=0.05,
+                 rate=4.0, workers=8):
+    """Burst of batch requests with some interactive ones mixed in, sent directly and
+    through the scheduler to a throttling stand-in server"""
+    from concurrent.futures import ThreadPoolExecutor
+    from pagination import create_session
+    from scheduler import RequestScheduler, INTERACTIVE, BATCH
+
+    def is_interactive(i):
+        return bool(interactive_every) and i % interactive_every == interactive_every - 1
+
+    results = {}
+
+    # Direct: every request goes out at once, with no retries
+    server = ThrottlingServer(server_limit, latency)
+    session = create_session(workers)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            statuses = list(pool.map(lambda i: session.get(f"{server.url}/{i}").status_code,
+                                     range(requests_count)))
+        seconds = time.perf_counter() - start
+    finally:
+        session.close()
+        server.close()
+    results['direct'] = {'succeeded': statuses.count(200), 'requests': requests_count,
+                         'seconds': seconds, 'server_429s': server.counts['throttled']}
+
+    # Scheduled: the whole batch backfill is queued before the interactive requests arrive
+    server = ThrottlingServer(server_limit, latency)
+    latencies = {INTERACTIVE: [], BATCH: []}
+    try:
+        with RequestScheduler(rate=rate, burst=max(1, int(rate)), workers=workers) as scheduler:
+            start = time.perf_counter()
+            futures = []
+            for i in sorted(range(requests_count), key=is_interactive):
+                priority = INTERACTIVE if is_interactive(i) else BATCH
+                future = scheduler.submit(f"{server.url}/{i}", priority)
+                future.add_done_callback(lambda f, p=priority, t=time.perf_counter():
+                                         latencies[p].append(time.perf_counter() - t))
+                futures.append(future)
+            statuses = [future.result().status_code for future in futures]
+            seconds = time.perf_counter() - start
+            stats = dict(scheduler.stats)
+    finally:
+        server.close()
+    results['scheduled'] = {'succeeded': statuses.count(200), 'requests': requests_count,
+                            'seconds': seconds, 'server_429s': server.counts['throttled'],
+                            'retries': stats['retries'],
+                            'interactive_latency': median(latencies[INTERACTIVE]),
+                            'batch_latency': median(latencies[BATCH])}
+    return results
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+def display_throttle(results):
+    print("\n🚦 Throttled Burst Results")
+    for mode, r in results.items():
+        line = (f"   {mode:<10} {r['succeeded']:>4}/{r['requests']} ok in {r['seconds']:6.2f}s "
+                f"{r['succeeded'] / r['seconds']:6.1f} ok/s  429s={r['server_429s']}")
+        if 'retries' in r:
+            line += f"  retries={r['retries']}"
+        print(line)
+        if r.get('interactive_latency') is not None:
+            print(f"              median latency: interactive {r['interactive_latency']:.2f}s, "
+                  f"batch {r['batch_latency']:.2f}s")
+
+def transfer_codecs():
+    """(encoding, compress, decompress) for every Content-Encoding that can be decoded here"""
+    import gzip
+    import zlib
+
+    codecs = [('gzip', gzip.compress, gzip.decompress), ('deflate', zlib.compress, zlib.decompress)]
+    try:
+        import brotli
+        codecs.append(('br', brotli.compress, brotli.decompress))
+    except ImportError:
+        pass
+    return codecs
+
+def best_seconds(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_decode(bodies, repeat=5):
+    """Decode throughput of every installed JSON backend, and what each transfer
+    encoding saves on the wire and costs to decompress, per response body"""
+    from json_backend import available_backends, load_codec, gc_paused
+
+    results = []
+    for name, body in bodies:
+        megabytes = len(body) / (1024 * 1024)
+        for backend in available_backends():
+            loads, _ = load_codec(backend)
+            # Timed the way the fetchers decode, with garbage collection paused
+            with gc_paused():
+                seconds = best_seconds(loads, body, repeat)
+            results.append({'dataset': name, 'kind': 'decode', 'codec': backend, 'bytes': len(body),
+                            'seconds': seconds, 'mb_per_sec': megabytes / seconds})
+        for encoding, compress, decompress in transfer_codecs():
+            compressed = compress(body)
+            seconds = best_seconds(decompress, compressed, repeat)
+            results.append({'dataset': name, 'kind': 'transfer', 'codec': encoding,
+                            'bytes': len(compressed), 'ratio': len(compressed) / len(body),
+                            'seconds': seconds, 'mb_per_sec': megabytes / seconds})
+    return results
+
+def display_decode(results):
+    print("\n🏁 Decode Results")
+    for r in results:
+        if r['kind'] == 'decode':
+            print(f"   {r['dataset']:<24} decode   {r['codec']:<8} {r['bytes']:>11,} B "
+                  f"{r['mb_per_sec']:>9.1f} MB/s")
+        else:
+            print(f"   {r['dataset']:<24} transfer {r['codec']:<8} {r['bytes']:>11,} B "
+                  f"{r['mb_per_sec']:>9.1f} MB/s  {r['ratio']:6.1%} of the body on the wire")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the compiler revisions")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help="save live responses as fixtures")
+    record.add_argument('catalog', nargs='?', default=DEFAULT_CATALOG)
+    record.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR)
+
+    run = commands.add_parser('run', help="benchmark on synthetic data and recorded fixtures")
+    run.add_argument('--compilers', nargs='+', default=list(COMPILERS), choices=COMPILERS)
+    run.add_argument('--depth', type=int, default=3, help="levels of nested lists")
+    run.add_argument('--fanout', type=int, default=2, help="nested objects per record")
+    run.add_argument('--list-length', type=int, default=5, help="records per nested list")
+    run.add_argument('--rows', type=int, default=200, help="top-level records")
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR)
+    run.add_argument('--no-synthetic', action='store_true')
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON report path")
+    run.add_argument('--baseline', help="earlier JSON report to compare against")
+    run.add_argument('--tolerance', type=float, default=0.1,
+                     help="allowed rows/sec drop versus the baseline")
+
+    decode = commands.add_parser('decode', help="JSON backends and transfer encodings on fixtures")
+    decode.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR)
+    decode.add_argument('--rows', type=int, default=2000,
+                        help="top-level records of the synthetic document used without fixtures")
+    decode.add_argument('--repeat', type=int, default=5)
+
+    throttle = commands.add_parser('throttle', help="request scheduler against a throttling local server")
+    throttle.add_argument('--requests', type=int, default=40)
+    throttle.add_argument('--interactive-every', type=int, default=10,
+                          help="every Nth request is interactive")
+    throttle.add_argument('--server-limit', type=int, default=4, help="requests/sec before 429s")
+    throttle.add_argument('--latency', type=float, default=0.05, help="seconds added per response")
+    throttle.add_argument('--rate', type=float, default=4.0, help="scheduler requests/sec per host")
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record_fixtures(load_catalog(args.catalog), args.fixtures)
+        return
+    if args.command == 'decode':
+        bodies = []
+        for name, path in fixture_datasets(args.fixtures):
+            with open(path, 'rb') as f:
+                bodies.append((name, f.read()))
+        if not bodies:
+            print(f"⚠️ No fixtures in {args.fixtures}; decoding a synthetic document instead")
+            bodies.append((f"synthetic-r{args.rows}",
+                           json.dumps(synthetic_document(rows=args.rows)).encode()))
+        display_decode(run_decode(bodies, args.repeat))
+        return
+    if args.command == 'throttle':
+        display_throttle(run_throttle(args.requests, args.interactive_every, args.server_limit,
+                                      args.latency, args.rate))
+        return
+
+    sources = []
+    if not args.no_synthetic:
+        params = {'depth': args.depth, 'fanout': args.fanout, 'list_length': args.list_length,
+                  'rows': args.rows, 'seed': args.seed}
+        name = f"synthetic-d{args.depth}-f{args.fanout}-l{args.list_length}-r{args.rows}"
+        sources.append({'kind': 'synthetic', 'name': name, 'params': params})
+    sources.extend({'kind': 'fixture', 'name': name, 'path': path}
+                   for name, path in fixture_datasets(args.fixtures))
+
+    report = run_suite(args.compilers, sources, args.repeat)
+    display_report(report)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"❌ {r['compiler']} on {r['dataset']}: {r['change']:+.1%} rows/sec")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import sys
+
+# Only the standard library is imported up front; each command imports what it
+# needs, so --help and cached fetches start in roughly interpreter time.
+
+FLAT_COMPILERS = {'1': 'compiler', '2': 'compiler_2', '3': 'compiler_3', '4': 'compiler_4'}
+
+def open_cache(args):
+    if not args.cache_dir:
+        return None
+    from http_cache import ResponseCache
+    return ResponseCache(args.cache_dir)
+
+def open_registry(args):
+    if not args.schema_registry:
+        return None
+    from schema_registry import SchemaRegistry
+    return SchemaRegistry(args.schema_registry)
+
+def run_fetch(args):
+    """Write an endpoint's raw JSON body to stdout"""
+    from compiler_5 import fetch_api_body
+
+    try:
+        body = fetch_api_body(args.url, open_cache(args))
+    # requests.RequestException is an OSError; catching that keeps requests unimported here
+    except (ValueError, OSError) as e:
+        print(f"❌ Fetch failed: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.buffer.write(body)
+    sys.stdout.buffer.write(b'\n')
+    return 0
+
+def run_flat(args):
+    """One flat DataFrame from one of the single-table compilers"""
+    import importlib
+
+    module = importlib.import_module(FLAT_COMPILERS[args.revision])
+    if args.columns:
+        if args.revision != '4':
+            raise SystemExit("--columns needs --revision 4")
+        module.one_click_api_to_dataframe(args.url, args.columns)
+    else:
+        module.one_click_api_to_dataframe(args.url)
+
+def parse_filters(filters):
+    """{'Table.column': [values]} from FIELD=VALUE[,VALUE...] arguments"""
+    parsed = {}
+    for item in filters or ():
+        field, sep, values = item.partition('=')
+        if not sep:
+            raise SystemExit(f"--where expects FIELD=VALUE, got {item}")
+        parsed[field] = values.split(',')
+    return parsed
+
+def run_relational(args):
+    """Relational tables from RelationalProcessor, optionally written to a sink"""
+    from compiler_5 import RelationalProcessor, display_results
+
+    profiler = None
+    if args.profile:
+        from instrumentation import StageProfiler
+        profiler = StageProfiler(trace_memory=args.trace_memory)
+
+    reference_schema = None
+    if args.reference_schema:
+        import json
+        with open(args.reference_schema) as f:
+            reference_schema = json.load(f)
+
+    if args.json_backend:
+        from json_backend import set_backend
+        set_backend(args.json_backend)
+
+    scheduler = None
+    if args.rate:
+        from scheduler import RequestScheduler, INTERACTIVE
+        scheduler = RequestScheduler(rate=args.rate)
+
+    processor = RelationalProcessor(cache=open_cache(args), normalize=args.normalize,
+                                    infer_dtypes=args.infer_dtypes, instrumentation=profiler,
+                                    validation=args.validation, reference_schema=reference_schema,
+                                    sample_size=args.sample_size,
+                                    schema_registry=open_registry(args),
+                                    projection=args.select,
+                                    session=scheduler.client(INTERACTIVE) if scheduler else None,
+                                    memory_budget=(int(args.memory_budget * 1024 * 1024)
+                                                   if args.memory_budget else None),
+                                    spill_dir=args.spill_dir,
+                                    extract_workers=args.workers)
+    try:
+        if args.stream:
+            result = processor.process_api_stream(args.url)
+        else:
+            result = processor.process_api_response(args.url, paginate=args.paginate)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+    if not result:
+        print("\n❌ Processing failed")
+        return 1
+
+    display_results(result)
+    if args.join:
+        from join_engine import JoinEngine
+        try:
+            joined = JoinEngine(result).join(args.join, parse_filters(args.where))
+        except (KeyError, ValueError) as e:
+            print(f"\n❌ Join failed: {e.args[0] if e.args else e}")
+            return 1
+        print(f"\n🔗 Join: {len(joined)} rows")
+        print(joined.head(20).to_string(index=False))
+    if args.sqlite:
+        from sqlite_store import write_sqlite
+        write_sqlite(result, args.sqlite, processor.column_types)
+    if args.arrow:
+        from arrow_store import write_dataset
+        write_dataset(result, args.arrow)
+    if profiler is not None:
+        print(profiler.report())
+        if args.profile != '-':
+            profiler.export_json(args.profile)
+    return 0
+
+def run_batch(args, extra):
+    from batch import main
+    return main(extra)
+
+def run_benchmark(args, extra):
+    from benchmark import main
+    return main(extra)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Turn JSON APIs into DataFrames and relational tables")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help="print the raw JSON body of an endpoint")
+    fetch.add_argument('url')
+    fetch.add_argument('--cache-dir', help="serve and store responses in an on-disk cache")
+    fetch.set_defaults(run=run_fetch)
+
+    flat = commands.add_parser('flat', help="flatten an endpoint into one DataFrame")
+    flat.add_argument('url')
+    flat.add_argument('--revision', choices=sorted(FLAT_COMPILERS), default='4',
+                      help="compiler revision to use")
+    flat.add_argument('--columns', nargs='+', help="only build these columns (revision 4)")
+    flat.set_defaults(run=run_flat)
+
+    relational = commands.add_parser('relational', help="convert an endpoint into related tables")
+    relational.add_argument('url')
+    relational.add_argument('--paginate', action='store_true', help="fetch every page")
+    relational.add_argument('--stream', action='store_true', help="parse while downloading")
+    relational.add_argument('--normalize', action='store_true', help="intern repeated nested objects")
+    relational.add_argument('--infer-dtypes', action='store_true',
+                            help="convert string numbers, dates and lap times")
+    relational.add_argument('--cache-dir', help="serve and store responses in an on-disk cache")
+    relational.add_argument('--validation', choices=('off', 'sampled', 'strict'), default='sampled',
+                            help="how much of the document to validate")
+    relational.add_argument('--reference-schema', metavar='JSON',
+                            help="pinned schema to validate against instead of the inferred one")
+    relational.add_argument('--sample-size', type=int, default=20,
+                            help="items checked per array when sampling")
+    relational.add_argument('--rate', type=float,
+                            help="requests per second per host, with retries on throttling")
+    relational.add_argument('--select', nargs='+', metavar='FIELD',
+                            help="only extract these fields, e.g. SprintResults.Driver.familyName")
+    relational.add_argument('--schema-registry', metavar='JSON',
+                            help="reuse registered schemas and re-infer only on drift")
+    relational.add_argument('--json-backend', choices=('orjson', 'ujson', 'stdlib'),
+                            help="JSON decoder (default: fastest installed)")
+    relational.add_argument('--workers', type=int,
+                            help="processes extracting large arrays in parallel")
+    relational.add_argument('--memory-budget', type=float, metavar='MB',
+                            help="spill table buffers to disk beyond this many megabytes")
+    relational.add_argument('--spill-dir', help="directory for spilled chunks (default: temp dir)")
+    relational.add_argument('--join', nargs='+', metavar='FIELD',
+                            help="join tables along their relationships, e.g. Races.raceName "
+                                 "Driver.familyName SprintResults.position")
+    relational.add_argument('--where', action='append', metavar='FIELD=VALUE',
+                            help="filter applied before joining, e.g. Races.round=3,4")
+    relational.add_argument('--sqlite', metavar='PATH', help="also load the tables into SQLite")
+    relational.add_argument('--arrow', metavar='DIR', help="also write a partitioned Arrow dataset")
+    relational.add_argument('--profile', nargs='?', const='-', metavar='JSON',
+                            help="print a stage profile, and save it as JSON if a path is given")
+    relational.add_argument('--trace-memory', action='store_true',
+                            help="include tracemalloc peaks in the profile")
+    relational.set_defaults(run=run_relational)
+
+    # These pass their arguments on to the batch and benchmark parsers
+    batch = commands.add_parser('batch', help="compile an endpoint catalog in parallel",
+                                add_help=False)
+    batch.set_defaults(run=run_batch)
+
+    benchmark = commands.add_parser('benchmark', help="offline benchmark of the compilers",
+                                    add_help=False)
+    benchmark.set_defaults(run=run_benchmark)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.run in (run_batch, run_benchmark):
+        return args.run(args, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import sys
+from array import array
+
+class ObjectColumn:
+    """Column of arbitrary Python values"""
+
+    def __init__(self, values=None):
+        self.values = values if values is not None else []
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        self.values.append(value)
+
+    def append_null(self):
+        self.values.append(None)
+
+    def pop(self):
+        self.values.pop()
+
+    def extend(self, other):
+        self.values.extend(other.values)
+
+    def extend_nulls(self, count):
+        self.values.extend([None] * count)
+
+    def nbytes(self):
+        """Estimated size: list slots plus values sized from an evenly spaced sample"""
+        if not self.values:
+            return 0
+        step = max(1, len(self.values) // 16)
+        sample = self.values[::step]
+        return 8 * len(self.values) + sum(map(sys.getsizeof, sample)) * len(self.values) // len(sample)
+
+    def to_objects(self):
+        return self.values
+
+    def to_array(self):
+        # Let pandas infer the dtype exactly as it would for a list of records
+        return self.values
+
+class IntColumn:
+    """int64 buffer with a separate null mask"""
+
+    def __init__(self):
+        self.values = array('q')
+        self.mask = bytearray()
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if value is None:
+            self.append_null()
+        elif type(value) is int:
+            self.values.append(value)
+            self.mask.append(0)
+        else:
+            raise TypeError(value)
+
+    def append_null(self):
+        self.values.append(0)
+        self.mask.append(1)
+
+    def pop(self):
+        self.values.pop()
+        self.mask.pop()
+
+    def extend(self, other):
+        self.values.extend(other.values)
+        self.mask.extend(other.mask)
+
+    def extend_nulls(self, count):
+        self.values.frombytes(bytes(count * self.values.itemsize))
+        self.mask.extend(b'\x01' * count)
+
+    def nbytes(self):
+        return len(self.values) * self.values.itemsize + len(self.mask)
+
+    def to_objects(self):
+        return [None if m else v for v, m in zip(self.values, self.mask)]
+
+    def to_array(self):
+        import numpy as np
+        import pandas as pd
+
+        values = np.array(self.values, dtype=np.int64)
+        if 1 in self.mask:
+            return pd.arrays.IntegerArray(values, np.array(self.mask, dtype=bool))
+        return values
+
+class FloatColumn:
+    """float64 buffer, nulls stored as NaN"""
+
+    def __init__(self):
+        self.values = array('d')
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if value is None:
+            self.append_null()
+        elif type(value) in (int, float):
+            self.values.append(value)
+        else:
+            raise TypeError(value)
+
+    def append_null(self):
+        self.values.append(float('nan'))
+
+    def pop(self):
+        self.values.pop()
+
+    def extend(self, other):
+        self.values.extend(other.values)
+
+    def extend_nulls(self, count):
+        self.values.extend(array('d', [float('nan')]) * count)
+
+    def nbytes(self):
+        return len(self.values) * self.values.itemsize
+
+    def to_objects(self):
+        return [None if v != v else v for v in self.values]
+
+    def to_array(self):
+        import numpy as np
+
+        return np.array(self.values, dtype=np.float64)
+
+class BoolColumn:
+    """Boolean buffer with a separate null mask"""
+
+    def __init__(self):
+        self.values = bytearray()
+        self.mask = bytearray()
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if value is None:
+            self.append_null()
+        elif type(value) is bool:
+            self.values.append(value)
+            self.mask.append(0)
+        else:
+            raise TypeError(value)
+
+    def append_null(self):
+        self.values.append(0)
+        self.mask.append(1)
+
+    def pop(self):
+        self.values.pop()
+        self.mask.pop()
+
+    def extend(self, other):
+        self.values.extend(other.values)
+        self.mask.extend(other.mask)
+
+    def extend_nulls(self, count):
+        self.values.extend(bytes(count))
+        self.mask.extend(b'\x01' * count)
+
+    def nbytes(self):
+        return len(self.values) + len(self.mask)
+
+    def to_objects(self):
+        return [None if m else bool(v) for v, m in zip(self.values, self.mask)]
+
+    def to_array(self):
+        import numpy as np
+        import pandas as pd
+
+        values = np.array(self.values, dtype=bool)
+        if 1 in self.mask:
+            return pd.arrays.BooleanArray(values, np.array(self.mask, dtype=bool))
+        return values
+
+COLUMN_TYPES = {
+    'integer': IntColumn,
+    'number': FloatColumn,
+    'boolean': BoolColumn,
+}
+
+class ColumnarTable:
+    """Column-oriented buffer for one relational table.
+
+    Values are appended straight into per-column buffers. Columns whose
+    schema type is integer, number or boolean use typed arrays and fall back
+    to plain object columns if a value of another type, or an integer beyond
+    int64, turns up. Columns missing from a row are backfilled with nulls.
+    """
+
+    def __init__(self, column_types=None):
+        self.column_types = column_types or {}
+        self.columns = {}
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def set(self, name, value):
+        """Set a value on the row under construction"""
+        column = self.columns.get(name)
+        if column is None:
+            column = COLUMN_TYPES.get(self.column_types.get(name), ObjectColumn)()
+            column.extend_nulls(self.num_rows)
+            self.columns[name] = column
+        elif len(column) > self.num_rows:
+            # Same key set twice in one row; the last value wins
+            column.pop()
+
+        try:
+            column.append(value)
+        except (TypeError, OverflowError):
+            # Another type, or an integer beyond int64
+            column = self.columns[name] = ObjectColumn(column.to_objects())
+            column.append(value)
+
+    def end_row(self):
+        """Finish the current row, backfilling columns it did not set"""
+        self.num_rows += 1
+        for column in self.columns.values():
+            if len(column) < self.num_rows:
+                column.append_null()
+
+    def append_row(self, row):
+        """Append a complete row given as a dict"""
+        for name, value in row.items():
+            self.set(name, value)
+        self.end_row()
+
+    def extend(self, other):
+        """Append every row of another table, aligning columns as set() would"""
+        for name, column in other.columns.items():
+            mine = self.columns.get(name)
+            if mine is None:
+                mine = self.columns[name] = type(column)()
+                mine.extend_nulls(self.num_rows)
+            if type(mine) is not type(column):
+                if type(mine) is not ObjectColumn:
+                    mine = self.columns[name] = ObjectColumn(mine.to_objects())
+                if type(column) is not ObjectColumn:
+                    column = ObjectColumn(column.to_objects())
+            mine.extend(column)
+        self.num_rows += other.num_rows
+        for column in self.columns.values():
+            if len(column) < self.num_rows:
+                column.extend_nulls(self.num_rows - len(column))
+
+    def nbytes(self):
+        """Estimated memory held by the column buffers"""
+        return sum(column.nbytes() for column in self.columns.values())
+
+    def in_row(self):
+        """Whether a row has been started but not finished"""
+        return any(len(column) > self.num_rows for column in self.columns.values())
+
+    def to_frame(self):
+        """Build a DataFrame from the column buffers"""
+        import pandas as pd
+
+        return pd.DataFrame({name: column.to_array() for name, column in self.columns.items()},
+                            index=pd.RangeIndex(self.num_rows))
@@ -1,23 +1,23 @@
-import requests
-import pandas as pd
-from genson import SchemaBuilder
-from jsonschema import validate, ValidationError
-import ace_tools as tools
-
 def fetch_api_data(api_url):
     """Fetch JSON data from an API."""
+    import requests
+
     response = requests.get(api_url)
     response.raise_for_status()
     return response.json()
 
 def generate_schema(data):
     """Automatically generate a JSON schema."""
+    from genson import SchemaBuilder
+
     builder = SchemaBuilder()
     builder.add_object(data)
     return builder.to_schema()
 
 def validate_data(data, schema):
     """Validate data against the detected schema."""
+    from jsonschema import validate, ValidationError
+
     try:
         validate(instance=data, schema=schema)
         print("✅ Data is valid!")
@@ -80,9 +80,13 @@ def flatten_nested_dict(d, parent_key="", sep="_"):
 
 def convert_to_dataframe(data):
     """Convert extracted list data into a Pandas DataFrame."""
+    import pandas as pd
+
     return pd.DataFrame(data) if data else pd.DataFrame()
 
 def one_click_api_to_dataframe(api_url):
+    import ace_tools as tools
+
     print(f"Fetching data from {api_url}...\n")
 
     data = fetch_api_data(api_url)
@@ -118,4 +122,5 @@ api_url = "http://api.jolpi.ca/ergast/f1/2024/sprint.json"
 #api_url = "http://api.jolpi.ca/ergast/f1/2024/driverstandings.json"
 #api_url = "http://api.jolpi.ca/ergast/f1/2024/constructorstandings.json"
 #api_url = "http://api.jolpi.ca/ergast/f1/status.json"
-one_click_api_to_dataframe(api_url)
\ No newline at end of file
+if __name__ == "__main__":
+    one_click_api_to_dataframe(api_url)
@@ -1,24 +1,25 @@
-import requests
-import pandas as pd
-from genson import SchemaBuilder
-from jsonschema import validate, ValidationError
-import ace_tools as tools
 import json
 
 def fetch_api_data(api_url):
     """Fetch JSON data from an API."""
+    import requests
+
     response = requests.get(api_url)
     response.raise_for_status()
     return response.json()
 
 def generate_schema(data):
     """Automatically generate a JSON schema."""
+    from genson import SchemaBuilder
+
     builder = SchemaBuilder()
     builder.add_object(data)
     return builder.to_schema()
 
 def validate_data(data, schema):
     """Validate data against the detected schema."""
+    from jsonschema import validate, ValidationError
+
     try:
         validate(instance=data, schema=schema)
         print("✅ Data is valid!")
@@ -37,27 +38,108 @@ def find_all_lists(schema, path=""):
                     lists.extend(find_all_lists(value.get("properties", {}), path + key + "."))
     return lists
 
+class FlatRows:
+    """Extracted rows stored once per nesting level with a pointer to the parent row.
+
+    Each row keeps only its own flattened columns; ancestor columns are
+    joined in by to_frame, and only for the columns that are asked for.
+    Parents are always stored before their children.
+    """
+
+    def __init__(self):
+        self.parents = []
+        self.emitted = []
+        self.shapes = []
+        self.shape_ids = {}
+        self.values = {}
+
+    def __len__(self):
+        return sum(self.emitted)
+
+    def add(self, flat, parent=-1, emit=True):
+        """Store one level's own columns and return its row index"""
+        row = len(self.parents)
+        self.parents.append(parent)
+        self.emitted.append(emit)
+        self.shapes.append(self.shape_ids.setdefault(tuple(flat), len(self.shape_ids)))
+        for key, value in flat.items():
+            rows, values = self.values.setdefault(key, ([], []))
+            rows.append(row)
+            values.append(value)
+        return row
+
+    @property
+    def columns(self):
+        """Column order of the merged rows, as building them as dicts would give"""
+        keys_of = list(self.shape_ids)
+        chains = []
+        chain_ids = {}
+        merged = []
+        order = {}
+        ordered = set()
+        for row, parent in enumerate(self.parents):
+            # Rows with the same own keys under the same ancestry share a key order
+            inherited = chains[parent] if parent >= 0 else -1
+            chain = chain_ids.get((self.shapes[row], inherited))
+            if chain is None:
+                chain = chain_ids[(self.shapes[row], inherited)] = len(merged)
+                keys = merged[inherited] if inherited >= 0 else ()
+                merged.append(tuple(dict.fromkeys(keys + keys_of[self.shapes[row]])))
+            if self.emitted[row] and chain not in ordered:
+                ordered.add(chain)
+                order.update(dict.fromkeys(merged[chain]))
+            chains.append(chain)
+        return list(order)
+
+    def resolve(self, column):
+        """Value of column for every row, inherited from the nearest ancestor that has it"""
+        import numpy as np
+
+        size = len(self.parents)
+        rows, values = self.values[column]
+        present = np.zeros(size, dtype=bool)
+        present[rows] = True
+        own = np.full(size, np.nan, dtype=object)
+        own[rows] = values
+
+        parents = np.asarray(self.parents)
+        source = np.arange(size)
+        # Pointer jumping: one vectorized step per nesting level
+        missing = ~present & (parents >= 0)
+        while missing.any():
+            source[missing] = parents[source[missing]]
+            missing = ~present[source] & (parents[source] >= 0)
+        return own[source]
+
+    def to_frame(self, columns=None):
+        """Denormalize into one flat DataFrame with a row per emitted record"""
+        import numpy as np
+        import pandas as pd
+
+        columns = self.columns if columns is None else [c for c in columns if c in self.values]
+        emitted = np.flatnonzero(self.emitted)
+        return pd.DataFrame({
+            column: pd.Series(self.resolve(column)[emitted]).infer_objects()
+            for column in columns
+        })
+
 def extract_data_from_json(data, list_paths):
     """Hybrid approach combining path detection and recursive extraction"""
-    extracted_data = []
+    extracted_data = FlatRows()
     
-    def extract_recursive(data, parent_context=None):
-        """Improved recursive extraction with context preservation"""
-        parent_context = parent_context or {}
-        
+    def extract_recursive(data, parent=-1):
+        """Recursive extraction keeping a pointer to the parent row"""
         if isinstance(data, list):
             for item in data:
                 if isinstance(item, dict):
-                    merged = {**parent_context, **flatten_nested_dict(item)}
-                    extracted_data.append(merged)
-                    # Preserve context for nested lists
-                    new_context = {**parent_context, **flatten_nested_dict(item)}
+                    row = extracted_data.add(flatten_nested_dict(item), parent)
+                    # Nested lists point back at this row for their context
                     for value in item.values():
-                        extract_recursive(value, new_context)
+                        extract_recursive(value, row)
         
         elif isinstance(data, dict):
             for value in data.values():
-                extract_recursive(value, parent_context)
+                extract_recursive(value, parent)
 
     # Process detected list paths first
     for path in list_paths:
@@ -68,7 +150,8 @@ def extract_data_from_json(data, list_paths):
         
         if isinstance(current_data, list):
             parent_context = get_parent_context(data, path)
-            extract_recursive(current_data, parent_context)
+            parent = extracted_data.add(parent_context, emit=False) if parent_context else -1
+            extract_recursive(current_data, parent)
 
     # Fallback to full recursive extraction if no paths found
     if not list_paths:
@@ -103,20 +186,22 @@ def flatten_nested_dict(d, parent_key="", sep="_"):
             items.append((new_key, v))
     return dict(items)
 
-def convert_to_dataframe(data):
+def convert_to_dataframe(data, columns=None):
     """Convert structured data to DataFrame with column hierarchy."""
+    import pandas as pd
+
     if not data:
         print("⚠️ No extractable list data found in API response")
         return pd.DataFrame()
     
-    df = pd.DataFrame(data)
+    df = data.to_frame(columns)
     
     # Clean column names and sort by hierarchy
     df.columns = [col.split(".")[-1] for col in df.columns]
     
     if not df.empty:
         hierarchy_levels = sorted(set(
-            ".".join(col.split(".")[:-1]) for col in data[0].keys()
+            ".".join(col.split(".")[:-1]) for col in df.columns
         ), key=lambda x: x.count("."))
         
         # Organize columns by hierarchy depth
@@ -131,8 +216,15 @@ def convert_to_dataframe(data):
     
     return df
 
-def one_click_api_to_dataframe(api_url):
-    """Convert API response to DataFrame with improved nested data handling."""
+def one_click_api_to_dataframe(api_url, columns=None):
+    """Convert API response to DataFrame with improved nested data handling.
+
+    columns limits the flat output to the named columns; only those are
+    joined down from parent levels.
+    """
+    import pandas as pd
+    import ace_tools as tools
+
     print(f"Fetching data from {api_url}...\n")
 
     data = fetch_api_data(api_url)
@@ -151,7 +243,7 @@ def one_click_api_to_dataframe(api_url):
         print("❌ No structured data could be extracted from the API response")
         return pd.DataFrame()
     
-    df = convert_to_dataframe(extracted_data)
+    df = convert_to_dataframe(extracted_data, columns)
     
     tools.display_dataframe_to_user("API Data", df)
     return df
@@ -162,4 +254,5 @@ def one_click_api_to_dataframe(api_url):
 api_url = "http://api.jolpi.ca/ergast/f1/2024/sprint.json"
 #api_url = "http://api.jolpi.ca/ergast/f1/2024/qualifying.json"
 #api_url = "http://api.jolpi.ca/ergast/f1/2024/1/pitstops.json"
-one_click_api_to_dataframe(api_url) 
\ No newline at end of file
+if __name__ == "__main__":
+    one_click_api_to_dataframe(api_url)
@@ -1,190 +1,410 @@
-import requests
-import pandas as pd
-import hashlib
 import json
 from collections import defaultdict
-from genson import SchemaBuilder
-from jsonschema import validate, ValidationError
-import ace_tools as tools
+import json_backend
+from json_stream import JSONStreamReader
+from pagination import fetch_all_pages
+from columnar import ColumnarTable
+from spill import SpillStore
+from extraction_plan import get_extraction_plan, Projection, KEY_COLUMN, foreign_key_column
+from instrumentation import NO_INSTRUMENTATION
+from validation import DEFAULT_SAMPLE_SIZE, iter_validation_errors, error_path
+
+# pandas, requests, genson, jsonschema and ace_tools are imported inside the
+# functions that use them, so importing this module stays cheap
 
 class RelationalProcessor:
-    def __init__(self):
-        self.tables = defaultdict(list)
+    def __init__(self, cache=None, normalize=False, infer_dtypes=False, instrumentation=None,
+                 validation='sampled', reference_schema=None, sample_size=DEFAULT_SAMPLE_SIZE,
+                 schema_registry=None, projection=None, session=None, memory_budget=None,
+                 spill_dir=None, extract_workers=None):
+        self.cache = cache
+        self.session = session
+        self.normalize = normalize
+        self.infer_dtypes = infer_dtypes
+        self.validation = validation
+        self.reference_schema = reference_schema
+        self.sample_size = sample_size
+        self.schema_registry = schema_registry
+        if projection is not None and not isinstance(projection, Projection):
+            projection = Projection(projection)
+        self.projection = projection
+        self.instrumentation = instrumentation or NO_INSTRUMENTATION
+        # With a memory budget (in bytes) table buffers spill to disk instead of growing
+        self.spill = SpillStore(memory_budget, spill_dir) if memory_budget else None
+        # Processes that extract chunks of large entity arrays in parallel
+        self.extract_workers = extract_workers
+        self.endpoint = None
+        self.tables = {}
         self.relationships = []
-        self.current_ids = defaultdict(int)
+        self.last_keys = defaultdict(int)
+        self.dimension_keys = defaultdict(dict)
         self.table_configs = []
+        self.column_types = {}
+        self.plan = None
+        self._relationship_keys = set()
 
-    def process_api_response(self, api_url):
+    def process_api_response(self, api_url, paginate=False, max_workers=8):
         """Main processing workflow"""
-        raw_data = fetch_api_data(api_url)
-        schema = generate_schema(raw_data)
-        
-        if not validate_data(raw_data, schema):
+        self.endpoint = api_url
+        body = None
+        with self.stage('fetch'):
+            if paginate:
+                raw_data = fetch_all_pages(api_url, max_workers=max_workers, session=self.session,
+                                           cache=self.cache, instrumentation=self.instrumentation)
+            elif self.extract_workers and self.extract_workers > 1:
+                # Parallel extraction hands its workers slices of the raw body
+                body, raw_data = fetch_api_document(api_url, cache=self.cache,
+                                                    instrumentation=self.instrumentation,
+                                                    session=self.session)
+            else:
+                raw_data = fetch_api_data(api_url, cache=self.cache,
+                                          instrumentation=self.instrumentation,
+                                          session=self.session)
+        if raw_data is None:
             return None
+        return self.process_data(raw_data, body)
+
+    def process_data(self, raw_data, body=None):
+        """Schema inference and relational conversion of a decoded document.
+
+        body is the raw JSON raw_data was decoded from, if the caller has it.
+        """
+        with self.stage('schema'):
+            schema = self.infer_schema(raw_data)
+        
+        with self.stage('validate'):
+            if not self.validate(raw_data, schema):
+                return None
         
-        self.analyze_schema(schema)
-        self.convert_to_relational(raw_data)
-        return self.structure_output()
+        with self.stage('analyze'):
+            self.analyze_schema(schema)
+        with self.stage('convert'):
+            rows_before = {name: len(table) for name, table in self.tables.items()}
+            self.convert_to_relational(raw_data, body)
+        self.count_entities(rows_before)
+        with self.stage('structure'):
+            return self.structure_output()
+
+    def infer_schema(self, data):
+        """Schema of a document, from the registry when its endpoint's shape is unchanged"""
+        if self.schema_registry is not None and self.endpoint:
+            return self.schema_registry.resolve(self.endpoint, data, self.instrumentation)
+        return generate_schema(data)
+
+    def validate(self, data, schema):
+        """Validate at the configured level, against the reference schema when one is pinned.
+
+        Without a reference schema the inferred one is used, which can only
+        catch problems in the sampled and strict checks themselves, so
+        sampling is the default.
+        """
+        if self.validation == 'off':
+            return True
+        return validate_data(data, self.reference_schema or schema, self.validation,
+                             self.sample_size, self.instrumentation, self.endpoint)
+
+    def stage(self, name):
+        """Report a processing stage of the current endpoint to the instrumentation"""
+        return self.instrumentation.stage(name, self.endpoint)
+
+    def count_entities(self, rows_before):
+        """Count the entities stored per table since rows_before was taken"""
+        for name, table in self.tables.items():
+            stored = len(table) - rows_before.get(name, 0)
+            if stored:
+                self.instrumentation.count('entities', stored, self.endpoint, table=name)
+
+    def process_api_stream(self, api_url, batch_size=1000):
+        """Streaming workflow: build tables without loading the whole document.
+
+        Returns None when the request fails or the download or document
+        breaks off mid-stream, like process_api_response on a failed fetch.
+        """
+        import requests
+
+        self.endpoint = api_url
+        chunks = fetch_api_stream(api_url, session=self.session)
+        if chunks is None:
+            return None
+        rows_before = {name: len(table) for name, table in self.tables.items()}
+        try:
+            with self.stage('stream'):
+                for name, rows in self.stream_to_relational(chunks, batch_size, self.stream_table):
+                    table = self.get_table(name)
+                    for row in rows:
+                        table.append_row(row)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"❌ Streaming failed: {str(e)}")
+            return None
+        self.count_entities(rows_before)
+        with self.stage('structure'):
+            return self.structure_output()
+
+    def stream_api_response(self, api_url, batch_size=1000):
+        """Yield (table name, rows) batches while the response downloads.
+
+        Errors while downloading or parsing are raised, not swallowed, so a
+        truncated document never passes for a complete one.
+        """
+        chunks = fetch_api_stream(api_url, session=self.session)
+        if chunks is None:
+            raise ValueError(f"Could not open a stream for {api_url}")
+        yield from self.stream_to_relational(chunks, batch_size)
 
     def analyze_schema(self, schema):
         """Identify potential tables from schema"""
-        def find_tables(subschema, path):
-            if isinstance(subschema, dict):
-                if subschema.get('type') == 'array':
-                    clean_path = '.'.join(path).replace('properties.', '')
-                    self.table_configs.append({
-                        'path': clean_path,
-                        'name': clean_path.split('.')[-1],
-                        'is_entity': 'items' in subschema and 
-                                   'properties' in subschema['items']
-                    })
-                for k, v in subschema.items():
-                    if k == 'properties':
-                        find_tables(v, path)
-                    else:
-                        find_tables(v, path + [k])
-
-        find_tables(schema, [])
-        self.table_configs = sorted(self.table_configs, 
-                                  key=lambda x: len(x['path'].split('.')))
-
-    def convert_to_relational(self, data):
-        """Convert data using schema-guided approach"""
-        for config in self.table_configs:
-            path = config['path'].split('.')
-            current = data
-            
-            # Safely navigate through the path
-            for p in path:
-                if isinstance(current, dict):
-                    current = current.get(p, {})
-                elif isinstance(current, list):
-                    # Handle list by processing first element (assuming homogeneous data)
-                    if len(current) > 0 and isinstance(current[0], dict):
-                        current = current[0].get(p, {})
-                    else:
-                        current = {}
-                        break
+        self.plan = get_extraction_plan(schema, self.normalize, self.projection)
+        self.table_configs = self.plan.table_configs
+        self.column_types = self.plan.column_types
+        for relationship in self.plan.relationships:
+            self._record_relationship(**relationship)
+
+    def get_table(self, name):
+        """Column buffers for a table, created on first use"""
+        table = self.tables.get(name)
+        if table is None:
+            if self.spill is not None:
+                table = self.spill.table(name, self.column_types.get(name))
+            else:
+                table = ColumnarTable(self.column_types.get(name))
+            self.tables[name] = table
+        return table
+
+    def stream_table(self, name, foreign_key=None):
+        """Table for streamed rows, typed by the plan or, without one, with integer keys"""
+        table = self.get_table(name)
+        if self.plan is None:
+            table.column_types.setdefault(KEY_COLUMN, 'integer')
+            if foreign_key is not None:
+                table.column_types.setdefault(foreign_key, 'integer')
+        return table
+
+    def convert_to_relational(self, data, body=None):
+        """Convert data in one pass over the document using the extraction plan"""
+        if self.extract_workers and self.extract_workers > 1:
+            from parallel_extract import extract_parallel
+            extract_parallel(self, data, self.extract_workers, body)
+        else:
+            self.plan.extract(self, data)
+
+    def stream_to_relational(self, chunks, batch_size=1000, on_entity=None):
+        """Convert a chunked JSON document into batches of entity rows.
+
+        Uses the entity paths from analyze_schema when a schema has been
+        analyzed; otherwise every array of objects is treated as a table.
+        Memory is bounded by batch_size, not by the size of the document.
+        Nested objects are emitted as child rows even when normalize is set.
+        on_entity is called with the table name and foreign key column of
+        every entity as it starts, so tables can be set up in document
+        order although child batches fill up first.
+        """
+        entity_paths = {c['path'] for c in self.table_configs if c['is_entity']}
+        prefixes = {'.'.join(parts[:i])
+                    for parts in (p.split('.') for p in entity_paths)
+                    for i in range(1, len(parts))}
+        batches = defaultdict(list)
+        reader = JSONStreamReader(chunks)
+
+        def walk_container(path):
+            if reader.peek() == '[' and not path and (not entity_paths or '' in entity_paths):
+                # A root-level array is the 'root' table, as find_table_configs names it
+                for _ in reader.iter_array():
+                    yield from walk_entity('root')
+                return
+            if reader.peek() != '{':
+                reader.skip_value()
+                return
+            for key in reader.iter_object():
+                child = f"{path}.{key}" if path else key
+                ch = reader.peek()
+                if ch == '[' and (not entity_paths or child in entity_paths):
+                    for _ in reader.iter_array():
+                        yield from walk_entity(key)
+                elif ch == '{' and (not entity_paths or child in prefixes):
+                    yield from walk_container(child)
                 else:
-                    current = {}
-                    break
-
-            if config['is_entity'] and isinstance(current, list):
-                parent_path = '.'.join(path[:-1])
-                parent_uid = self.get_parent_uid(parent_path)
-                
-                for idx, item in enumerate(current):
-                    uid = f"{parent_uid}.{idx}" if parent_uid else str(idx)
-                    self.store_entity(config['name'], item, uid, parent_uid)
-
-    def store_entity(self, name, data, uid, parent_uid=None):
-        """Store normalized entity data"""
-        # Base entity fields
-        entity_data = {'uid': uid}
-        if parent_uid:
-            entity_data[f'parent_{name}_uid'] = parent_uid
-        
-        # Relationships
-        if parent_uid:
-            parent_entity = parent_uid.split('.')[0]
+                    reader.skip_value()
+
+        def walk_entity(name, parent=None, parent_key=None):
+            if reader.peek() != '{':
+                reader.skip_value()
+                return
+            key = self.last_keys[name] = self.last_keys[name] + 1
+            entity_data = {KEY_COLUMN: key}
+            foreign_key = None
+            if parent is not None:
+                foreign_key = foreign_key_column(parent)
+                entity_data[foreign_key] = parent_key
+                self._record_relationship(parent, name, foreign_key)
+            if on_entity is not None:
+                on_entity(name, foreign_key)
+            for k in reader.iter_object():
+                ch = reader.peek()
+                if ch == '{':
+                    yield from walk_entity(k, name, key)
+                elif ch == '[':
+                    for _ in reader.iter_array():
+                        yield from walk_entity(k, name, key)
+                else:
+                    value = reader.read_value()
+                    entity_data[f'api_{k}' if k in entity_data else k] = value
+
+            batch = batches[name]
+            batch.append(entity_data)
+            if len(batch) >= batch_size:
+                yield name, batch
+                batches[name] = []
+
+        yield from walk_container('')
+        for name, batch in batches.items():
+            if batch:
+                yield name, batch
+
+    def export_state(self):
+        """Tables and key counters needed to keep appending with stable keys"""
+        return {
+            'tables': self.tables,
+            'relationships': self.relationships,
+            'last_keys': dict(self.last_keys),
+            'dimension_keys': dict(self.dimension_keys),
+        }
+
+    def restore_state(self, state):
+        """Continue from tables built by an earlier run"""
+        self.tables = state['tables']
+        self.last_keys = defaultdict(int, state['last_keys'])
+        self.dimension_keys = defaultdict(dict, state['dimension_keys'])
+        for relationship in state['relationships']:
+            self._record_relationship(**relationship)
+
+    def _record_relationship(self, parent, child, foreign_key):
+        """Record a parent/child relationship once"""
+        if (parent, child) not in self._relationship_keys:
+            self._relationship_keys.add((parent, child))
             self.relationships.append({
-                'parent': parent_entity,
-                'child': name,
-                'foreign_key': f'{parent_entity}_uid'
+                'parent': parent,
+                'child': child,
+                'foreign_key': foreign_key
             })
-        
-        # Flatten attributes
-        for k, v in data.items():
-            if not isinstance(v, (dict, list)):
-                entity_data[k] = v
-            elif isinstance(v, dict):
-                # Handle 1:1 relationships
-                nested_uid = f"{uid}.{k}"
-                entity_data[f'{k}_uid'] = nested_uid
-                self.store_entity(k, v, nested_uid, uid)
-            elif isinstance(v, list):
-                # Handle 1:many relationships
-                for i, item in enumerate(v):
-                    list_uid = f"{uid}.{k}.{i}"
-                    self.store_entity(k, item, list_uid, uid)
-        
-        self.tables[name].append(entity_data)
-
-    def get_parent_uid(self, path):
-        """Generate hierarchical UID based on path"""
-        parts = path.split('.')
-        uid = []
-        for p in parts:
-            self.current_ids[p] = self.current_ids.get(p, -1) + 1
-            uid.append(str(self.current_ids[p]))
-        return '.'.join(uid)
 
     def structure_output(self):
-        """Create final DataFrame structure"""
-        structured = {
-            'tables': {},
-            'relationships': pd.DataFrame(self.relationships).drop_duplicates().to_dict('records')
+        """Create final DataFrame structure.
+
+        Tables that spilled to disk are returned as lazy ChunkedTable views.
+        """
+        result = {
+            'tables': {name: (table.view() if self.spill is not None and table.chunks
+                              else table.to_frame())
+                       for name, table in self.tables.items()},
+            'relationships': list(self.relationships)
         }
-        
-        for name, records in self.tables.items():
-            df = pd.DataFrame(records)
-            
-            # Add auto-increment ID for primary key
-            df.insert(0, 'id', range(1, len(df)+1))
-            
-            # Clean up UID columns
-            uid_cols = [c for c in df.columns if 'uid' in c]
-            for c in uid_cols:
-                if c != 'uid':
-                    df = df.drop(c, axis=1)
-            
-            structured['tables'][name] = df
-        
-        return structured
+        if self.infer_dtypes:
+            from dtype_inference import apply_dtypes
+            apply_dtypes(result, self.column_types)
+        return result
+
+def with_json_format(api_url):
+    """Force JSON response format"""
+    if '?' in api_url:
+        return api_url + "&format=json"
+    return api_url + "?format=json"
+
+def fetch_api_body(api_url, cache=None, instrumentation=None, session=None):
+    """Fetch the raw JSON body of an API endpoint, raising on failure"""
+    endpoint = api_url
+    api_url = with_json_format(api_url)
+    
+    if cache is not None:
+        body, content_type = cache.fetch(api_url, session)
+    else:
+        import requests
+
+        response = (session or requests).get(
+            api_url, headers={'Accept-Encoding': json_backend.accept_encoding()})
+        response.raise_for_status()
+        body = response.content
+        content_type = response.headers.get('Content-Type', '')
+        if instrumentation is not None:
+            # Bytes on the wire, before gzip/deflate/brotli decoding
+            instrumentation.count('bytes_transferred', response.raw.tell(), endpoint=endpoint)
+    
+    # Verify content type
+    if 'json' not in content_type:
+        raise ValueError(f"Unexpected content type: {content_type}")
+    
+    if instrumentation is not None:
+        instrumentation.count('bytes_fetched', len(body), endpoint=endpoint)
+    return body
+
+def fetch_api_document(api_url, cache=None, instrumentation=None, session=None):
+    """Fetch an endpoint as (raw body, decoded data), or (None, None) on failure"""
+    import requests
 
-def fetch_api_data(api_url):
+    try:
+        body = fetch_api_body(api_url, cache, instrumentation, session)
+        return body, json_backend.loads(body)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"❌ API request failed: {str(e)}")
+        return None, None
+    except json.JSONDecodeError as e:
+        print(f"❌ Invalid JSON response: {str(e)}")
+        return None, None
+
+def fetch_api_data(api_url, cache=None, instrumentation=None, session=None):
     """Fetch JSON data from an API endpoint with proper format handling"""
+    return fetch_api_document(api_url, cache, instrumentation, session)[1]
+
+def fetch_api_stream(api_url, chunk_size=64 * 1024, session=None):
+    """Open a streaming request and return an iterator of raw body chunks"""
+    import requests
+
     try:
-        # Force JSON response format
-        if '?' in api_url:
-            api_url += "&format=json"
-        else:
-            api_url += "?format=json"
-        
-        response = requests.get(api_url)
+        response = (session or requests).get(
+            with_json_format(api_url), stream=True,
+            headers={'Accept-Encoding': json_backend.accept_encoding()})
         response.raise_for_status()
-        
-        # Verify content type
+
         content_type = response.headers.get('Content-Type', '')
         if 'json' not in content_type:
+            response.close()
             raise ValueError(f"Unexpected content type: {content_type}")
-        
-        return response.json()
+
+        return response.iter_content(chunk_size=chunk_size)
     except (requests.exceptions.RequestException, ValueError) as e:
         print(f"❌ API request failed: {str(e)}")
         return None
-    except json.JSONDecodeError as e:
-        print(f"❌ Invalid JSON response: {str(e)}")
-        return None
 
 def generate_schema(data):
     """Generate JSON schema from data."""
+    from genson import SchemaBuilder
+
     builder = SchemaBuilder()
     builder.add_object(data)
     return builder.to_schema()
 
-def validate_data(data, schema):
-    """Validate data against schema."""
-    try:
-        validate(instance=data, schema=schema)
-        print("✅ Data validation passed")
-        return True
-    except ValidationError as e:
-        print(f"❌ Validation error: {e.message}")
+def validate_data(data, schema, level='strict', sample_size=DEFAULT_SAMPLE_SIZE,
+                  instrumentation=None, endpoint=None, max_reported=20):
+    """Validate data against schema, reporting every error as it is found."""
+    errors = 0
+    for error in iter_validation_errors(data, schema, level, sample_size):
+        errors += 1
+        if errors <= max_reported:
+            print(f"❌ Validation error at {error_path(error)}: {error.message}")
+        if instrumentation is not None:
+            instrumentation.count('validation_errors', endpoint=endpoint)
+    
+    if errors:
+        if errors > max_reported:
+            print(f"❌ ... {errors - max_reported} more validation errors")
         return False
+    print("✅ Data validation passed")
+    return True
 
 def display_results(result):
     """Improved result display"""
+    import pandas as pd
+    import ace_tools as tools
+
     print("\n🏁 Processing Results")
     
     # Show tables
@@ -0,0 +1,228 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from extraction_plan import KEY_COLUMN
+from spill import ChunkedTable
+
+INTEGER_PATTERN = r'-?(?:0|[1-9]\d*)'
+FLOAT_PATTERN = r'-?\d+\.\d+|-?\d+(?:\.\d+)?[eE][-+]?\d+'
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}'
+# Lap and race times such as 1:32.123 or 1:32:12.345
+DURATION_PATTERN = r'(?:\d+:)?\d{1,2}:\d{2}(?:\.\d+)?'
+# pandas' own text dtype: str from pandas 3 on, object before
+TEXT_DTYPE = pd.Series([], dtype='str').dtype
+
+def is_text_dtype(dtype):
+    return (dtype == object or isinstance(dtype, pd.CategoricalDtype)
+            or pd.api.types.is_string_dtype(dtype))
+
+def is_text(series):
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+def matches(series, pattern):
+    """True if every non-null value is a string matching pattern (vectorized)"""
+    values = series.dropna()
+    if values.empty:
+        return False
+    return bool(values.str.fullmatch(pattern).eq(True).all())
+
+def sample_values(series, sample_size):
+    values = series.dropna()
+    if len(values) > sample_size:
+        values = values.sample(sample_size, random_state=0)
+    return values
+
+def sniff_type(series, sample_size=1000):
+    """Guess a column's type from a sample of its values"""
+    sample = sample_values(series, sample_size)
+    if sample.empty or not all(isinstance(v, str) for v in sample):
+        return None
+    for kind, pattern in (('integer', INTEGER_PATTERN), ('float', FLOAT_PATTERN),
+                          ('date', DATE_PATTERN), ('duration', DURATION_PATTERN)):
+        if matches(sample, pattern):
+            return kind
+    return 'text'
+
+def to_duration(series):
+    """Parse m:ss.fff / h:mm:ss.fff strings into timedeltas"""
+    colons = series.str.count(':')
+    return pd.to_timedelta(series.where(colons == 2, '0:' + series))
+
+def downcast_numeric(series, kind):
+    if kind == 'integer':
+        downcast = pd.to_numeric(series, downcast='integer')
+        if series.isna().any():
+            # Keep integers with gaps integral instead of letting them become floats
+            downcast = pd.to_numeric(series).astype(pd.Int64Dtype())
+            for dtype in (pd.Int8Dtype(), pd.Int16Dtype(), pd.Int32Dtype()):
+                if downcast.dropna().between(*_int_range(dtype)).all():
+                    return downcast.astype(dtype)
+        return downcast
+    return pd.to_numeric(series, downcast='float')
+
+def _int_range(dtype):
+    bits = dtype.itemsize * 8
+    return -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+
+def convert_column(series, declared=None, sample_size=1000, category_ratio=0.5):
+    """Convert one column to the most compact dtype its values allow"""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series.dtype):
+        # A declared integer column with gaps arrives as float64
+        if declared == 'integer' and series.dropna().mod(1).eq(0).all():
+            return downcast_numeric(series, 'integer')
+        return pd.to_numeric(series, downcast='float')
+    if not is_text(series):
+        return series
+
+    kind = sniff_type(series, sample_size)
+    if kind in ('integer', 'float'):
+        pattern = INTEGER_PATTERN if kind == 'integer' else f'{INTEGER_PATTERN}|{FLOAT_PATTERN}'
+        if matches(series, pattern):
+            return downcast_numeric(series, kind)
+    elif kind == 'date' and matches(series, DATE_PATTERN):
+        return pd.to_datetime(series, format='%Y-%m-%d', errors='coerce')
+    elif kind == 'duration' and matches(series, DURATION_PATTERN):
+        return to_duration(series)
+    elif kind is None:
+        return series
+
+    values = series.dropna()
+    if len(values) and values.nunique() <= max(1, category_ratio * len(values)):
+        return series.astype('category')
+    if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+        return series.astype(TEXT_DTYPE)
+    return series
+
+NULLABLE_DTYPES = {'bool': pd.BooleanDtype(), 'int8': pd.Int8Dtype(), 'int16': pd.Int16Dtype(),
+                   'int32': pd.Int32Dtype(), 'int64': pd.Int64Dtype()}
+
+def numpy_dtype(dtype):
+    """numpy dtype behind a nullable extension dtype, or the dtype itself"""
+    return getattr(dtype, 'numpy_dtype', dtype)
+
+def add_uniques(uniques, series, limit):
+    """Distinct non-null values seen so far, or None once there are more than limit"""
+    if uniques is None:
+        return None
+    try:
+        uniques = uniques | set(series.dropna().unique())
+    except TypeError:
+        return None
+    return uniques if len(uniques) <= limit else None
+
+def unify_dtypes(dtypes, has_nulls, uniques, count, all_strings, category_ratio):
+    """One dtype for a column that converted to dtypes chunk by chunk.
+
+    Numbers widen to the smallest dtype holding every chunk and become
+    nullable if any chunk had gaps; dates and durations found in every
+    chunk are kept. Text, or a mix of kinds, becomes categorical when the
+    distinct values of all chunks together are few enough, as
+    convert_column decides for a whole column, and pandas' text dtype
+    otherwise.
+    """
+    if not dtypes:
+        return None
+    numbers = [numpy_dtype(dtype) for dtype in dtypes]
+    if all(pd.api.types.is_bool_dtype(dtype) for dtype in numbers):
+        return pd.BooleanDtype() if has_nulls else np.dtype(bool)
+    if all(pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype)
+           for dtype in numbers):
+        dtype = np.result_type(*numbers)
+        return NULLABLE_DTYPES[dtype.name] if has_nulls and dtype.kind == 'i' else dtype
+    same = len({str(dtype) for dtype in dtypes}) == 1
+    if same and not is_text_dtype(dtypes[0]):
+        return dtypes[0]
+    if not all_strings:
+        return np.dtype(object)
+    if uniques is not None and len(uniques) <= max(1, category_ratio * count):
+        try:
+            categories = sorted(uniques)
+        except TypeError:
+            categories = list(uniques)
+        return pd.CategoricalDtype(categories)
+    return TEXT_DTYPE
+
+def cast_column(series, dtype):
+    """A raw chunk column converted to the dtype chosen for the whole table"""
+    if series.dtype == dtype:
+        return series
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.to_datetime(series, format='%Y-%m-%d', errors='coerce')
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return to_duration(series)
+    if is_text_dtype(dtype):
+        return series.astype(dtype)
+    if is_text(series):
+        series = pd.to_numeric(series)
+    return series.astype(dtype)
+
+def chunked_dtypes(table, convert, category_ratio):
+    """Column dtypes for a spilled table, inferred in one pass over all of its chunks.
+
+    Each chunk is converted as an in-memory table would be, and the chunk
+    dtypes are unified, so every chunk comes out with the same dtypes.
+    """
+    limit = max(1, category_ratio * len(table))
+    dtypes = defaultdict(list)
+    has_nulls = defaultdict(bool)
+    uniques = defaultdict(set)
+    counts = defaultdict(int)
+    all_strings = defaultdict(lambda: True)
+    for df in table.iter_frames():
+        converted = convert(df)
+        for column in df.columns:
+            raw = df[column]
+            non_null = int(raw.notna().sum())
+            has_nulls[column] |= non_null < len(raw)
+            # An empty chunk says nothing about the column's type
+            if not non_null:
+                continue
+            counts[column] += non_null
+            dtypes[column].append(converted[column].dtype)
+            uniques[column] = add_uniques(uniques[column], raw, limit)
+            all_strings[column] &= pd.api.types.infer_dtype(raw, skipna=True) == 'string'
+    return {column: unify_dtypes(dtypes[column], has_nulls[column], uniques[column],
+                                 counts[column], all_strings[column], category_ratio)
+            for column in table.columns}
+
+def apply_dtypes(result, column_types=None, sample_size=1000, category_ratio=0.5):
+    """Typing stage: convert every table of a result to compact dtypes.
+
+    Ergast sends numbers, dates and lap times as strings. Each text column is
+    sniffed from a sample, confirmed with one vectorized regex pass over
+    the whole column, then converted to a downcast numeric, datetime or
+    timedelta dtype. Remaining low-cardinality text columns become
+    categoricals. Types declared by the inferred schema are trusted and
+    only downcast. Surrogate and foreign keys stay int64 so tables from
+    later runs keep the same key types. Spilled tables get their dtypes
+    from one pass over all chunks, and every chunk is cast to them as it
+    is read.
+    """
+    column_types = column_types or {}
+    foreign_keys = {(r['child'], r['foreign_key']) for r in result['relationships']}
+    for name, df in result['tables'].items():
+        def convert(df, name=name, declared=column_types.get(name, {})):
+            return pd.DataFrame({
+                column: (df[column] if column == KEY_COLUMN or (name, column) in foreign_keys
+                         else convert_column(df[column], declared.get(column), sample_size,
+                                             category_ratio))
+                for column in df.columns
+            }, index=df.index)
+
+        if isinstance(df, ChunkedTable):
+            dtypes = chunked_dtypes(df, convert, category_ratio)
+
+            def cast(df, dtypes=dtypes):
+                return pd.DataFrame({column: (df[column] if dtypes[column] is None
+                                              else cast_column(df[column], dtypes[column]))
+                                     for column in df.columns}, index=df.index)
+            result['tables'][name] = df.map_frames(cast)
+        else:
+            result['tables'][name] = convert(df)
+    return result
@@ -0,0 +1,311 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from columnar import COLUMN_TYPES
+from lru import LRUCache
+
+MAX_CACHED_PLANS = 64
+
+# Compiled plans keyed by schema fingerprint, shared by every processor
+_plan_cache = LRUCache(MAX_CACHED_PLANS)
+
+def schema_fingerprint(schema):
+    """Stable hash of a JSON schema"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+def get_extraction_plan(schema, normalize=False, projection=None):
+    """Return the compiled plan for a schema, compiling it on first sight"""
+    fingerprint = schema_fingerprint(schema)
+    cache_key = (fingerprint, normalize, projection.key if projection is not None else None)
+    plan = _plan_cache.get(cache_key)
+    if plan is None:
+        plan = ExtractionPlan(schema, fingerprint, normalize, projection)
+        _plan_cache.put(cache_key, plan)
+    return plan
+
+def content_digest(data):
+    """Hash identifying a nested object by its content"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+def find_table_configs(schema):
+    """Identify potential tables from schema, with the schema of each array"""
+    found = []
+
+    def find_tables(subschema, path):
+        if isinstance(subschema, dict):
+            if subschema.get('type') == 'array':
+                clean_path = '.'.join(path).replace('properties.', '')
+                config = {
+                    'path': clean_path,
+                    'name': clean_path.split('.')[-1] or 'root',
+                    'is_entity': 'items' in subschema and
+                                 'properties' in subschema['items']
+                }
+                found.append((config, subschema.get('items')))
+            for k, v in subschema.items():
+                if k == 'properties':
+                    find_tables(v, path)
+                else:
+                    find_tables(v, path + [k])
+
+    find_tables(schema, [])
+    return sorted(found, key=lambda x: len(x[0]['path'].split('.')))
+
+class Projection:
+    """The tables and columns a query needs.
+
+    Fields are dotted paths whose last part is a column and whose prefix
+    names a table by the trailing entity names on its path, so
+    'SprintResults.Driver.familyName' selects familyName of the Driver
+    table nested in SprintResults. A dict maps such table paths to column
+    lists instead; '*' selects every column of a table.
+    """
+
+    def __init__(self, fields):
+        self.columns = defaultdict(set)
+        if isinstance(fields, dict):
+            for table, columns in fields.items():
+                self.columns[tuple(table.split('.'))].update(columns)
+        else:
+            for field in fields:
+                *table, column = field.split('.')
+                if not table:
+                    raise ValueError(f"Projection field needs a table: {field}")
+                self.columns[tuple(table)].add(column)
+        self.key = frozenset((table, frozenset(columns)) for table, columns in self.columns.items())
+
+    def selected_columns(self, path):
+        """Columns requested from the table at path, None if it is not selected"""
+        selected = None
+        for table, columns in self.columns.items():
+            if path[-len(table):] == table:
+                selected = (selected or set()) | columns
+        return selected
+
+# Surrogate primary key column of every table
+KEY_COLUMN = 'id'
+
+def foreign_key_column(parent):
+    """Name of the column holding a parent table's key"""
+    return f'{parent}_id'
+
+def widen_type(previous, kind):
+    """Column type able to hold values of both schema types"""
+    if previous == kind:
+        return kind
+    # integer/number mixes widen to number, anything else stays untyped
+    return 'number' if {previous, kind} == {'integer', 'number'} else 'string'
+
+class EntityPlan:
+    """Precompiled extractor for one entity table.
+
+    The schema is interpreted once here: scalar attributes, 1:1 nested
+    objects and 1:many arrays of objects are sorted into separate lists so
+    that store() only moves data. Column types and relationships are
+    registered on the owning ExtractionPlan as the plan is built.
+
+    When the plan normalizes, nested objects become dimension tables: each
+    distinct object is stored once and referencing rows hold its key.
+
+    With a projection, only the requested columns of selected tables are
+    kept; tables above a selected one keep just their keys so the selected
+    rows still join up, and everything else is never visited.
+    """
+
+    def __init__(self, name, schema, plan, parent=None, path=()):
+        self.name = name
+        self.path = path + (name,)
+        self.parent = parent
+        self.parent_column = foreign_key_column(parent) if parent else None
+        self.scalars = []
+        self.dimensions = []
+        self.children = []
+        # Members in schema order, for registering types and relationships
+        self.members = []
+
+        properties = schema.get('properties', {})
+        reserved = {KEY_COLUMN, self.parent_column}
+        if plan.normalize:
+            reserved.update(foreign_key_column(key) for key, prop in properties.items()
+                            if prop.get('type') == 'object')
+        selected = plan.projection.selected_columns(self.path) if plan.projection else {'*'}
+
+        for key, prop in properties.items():
+            kind = prop.get('type')
+            if kind == 'object' and plan.normalize:
+                dimension = EntityPlan(key, prop, plan, path=self.path)
+                if dimension.needed:
+                    column = foreign_key_column(key)
+                    self.dimensions.append((key, column, dimension))
+                    self.members.append(('dimension', column, dimension))
+            elif kind == 'object':
+                self.add_child(key, False, EntityPlan(key, prop, plan, name, self.path))
+            elif kind == 'array':
+                items = prop.get('items')
+                if isinstance(items, dict) and items.get('type') == 'object':
+                    self.add_child(key, True, EntityPlan(key, items, plan, name, self.path))
+            elif selected is not None:
+                # Keep the API's own attributes clear of the key columns
+                column = f'api_{key}' if key in reserved else key
+                if '*' in selected or key in selected or column in selected:
+                    self.scalars.append((key, column))
+                    self.members.append(('scalar', column, kind))
+
+        self.needed = selected is not None or bool(self.children or self.dimensions)
+
+    def add_child(self, source, is_list, plan):
+        if plan.needed:
+            self.children.append((source, is_list, plan))
+            self.members.append(('child', None, plan))
+
+    def register(self, plan):
+        """Record this table's column types and relationships on the plan, in schema order"""
+        plan.add_column_type(self.name, KEY_COLUMN, 'integer')
+        if self.parent:
+            plan.add_column_type(self.name, self.parent_column, 'integer')
+            plan.add_relationship(self.parent, self.name, self.parent_column)
+        for member, column, value in self.members:
+            if member == 'dimension':
+                value.register(plan)
+                plan.add_column_type(self.name, column, 'integer')
+                plan.add_relationship(value.name, self.name, column)
+            elif member == 'child':
+                value.register(plan)
+            elif isinstance(value, str) and value in COLUMN_TYPES:
+                plan.add_column_type(self.name, column, value)
+
+    def store(self, processor, data, parent_key=None):
+        """Store one entity and everything nested below it, returning its key"""
+        keys = processor.last_keys
+        key = keys[self.name] = keys[self.name] + 1
+
+        table = processor.get_table(self.name)
+        set_value = table.set
+        set_value(KEY_COLUMN, key)
+        if parent_key is not None:
+            set_value(self.parent_column, parent_key)
+
+        get = data.get
+        for source, column in self.scalars:
+            set_value(column, get(source))
+        for source, column, plan in self.dimensions:
+            value = get(source)
+            if value is not None:
+                set_value(column, plan.intern(processor, value))
+        table.end_row()
+
+        for source, is_list, plan in self.children:
+            value = get(source)
+            if value is None:
+                continue
+            if is_list:
+                for item in value:
+                    plan.store(processor, item, key)
+            else:
+                plan.store(processor, value, key)
+        return key
+
+    def intern(self, processor, data):
+        """Key of the dimension row holding this content, stored on first sight"""
+        index = processor.dimension_keys[self.name]
+        digest = content_digest(data)
+        key = index.get(digest)
+        if key is None:
+            key = index[digest] = self.store(processor, data)
+        return key
+
+class TablePlan:
+    """A table config with its path pre-split and its entity plan compiled"""
+
+    def __init__(self, config, items_schema):
+        self.config = config
+        self.steps = tuple(config['path'].split('.')) if config['path'] else ()
+        self.items_schema = items_schema
+        self.entity = None
+
+class PathTrie:
+    """Table paths merged by shared prefix; a node either routes or is a table"""
+
+    def __init__(self):
+        self.children = {}
+        self.table = None
+
+    def add(self, table_plan):
+        node = self
+        for step in table_plan.steps:
+            node = node.children.setdefault(step, PathTrie())
+        node.table = table_plan
+
+    def walk(self, processor, value):
+        """Route every element below this node to the table it belongs to"""
+        if self.table is not None:
+            if isinstance(value, list):
+                store = self.table.entity.store
+                for item in value:
+                    if isinstance(item, dict):
+                        store(processor, item)
+        elif isinstance(value, dict):
+            for key, child in self.children.items():
+                if key in value:
+                    child.walk(processor, value[key])
+        elif isinstance(value, list):
+            # 'items' steps descend into every element of a non-entity array
+            child = self.children.get('items')
+            if child is not None:
+                for item in value:
+                    child.walk(processor, item)
+
+def outermost_entity_tables(tables):
+    """Entity tables not nested inside another entity table.
+
+    Nested tables are reached through their parent's EntityPlan.
+    """
+    entity_paths = set()
+    outermost = []
+    for table_plan in tables:
+        if not table_plan.config['is_entity']:
+            continue
+        steps = table_plan.steps
+        if any('.'.join(steps[:i]) in entity_paths for i in range(len(steps))):
+            continue
+        entity_paths.add('.'.join(steps))
+        outermost.append(table_plan)
+    return outermost
+
+class ExtractionPlan:
+    """Everything derived from a schema that conversion needs, compiled once"""
+
+    def __init__(self, schema, fingerprint=None, normalize=False, projection=None):
+        self.schema = schema
+        self.fingerprint = fingerprint or schema_fingerprint(schema)
+        self.normalize = normalize
+        self.projection = projection
+        found = find_table_configs(schema)
+        self.table_configs = [config for config, _ in found]
+        self.tables = [TablePlan(config, items) for config, items in found]
+        self.column_types = defaultdict(dict)
+        self.relationships = []
+
+        self.trie = PathTrie()
+        for table_plan in outermost_entity_tables(self.tables):
+            entity = EntityPlan(table_plan.config['name'], table_plan.items_schema, self)
+            if entity.needed:
+                table_plan.entity = entity
+                entity.register(self)
+                self.trie.add(table_plan)
+        self.column_types = dict(self.column_types)
+
+    def add_column_type(self, table, column, kind):
+        types = self.column_types[table]
+        types[column] = widen_type(types[column], kind) if column in types else kind
+
+    def add_relationship(self, parent, child, foreign_key):
+        relationship = {'parent': parent, 'child': child, 'foreign_key': foreign_key}
+        if relationship not in self.relationships:
+            self.relationships.append(relationship)
+
+    def extract(self, processor, data):
+        """Convert a whole document in a single pass"""
+        self.trie.walk(processor, data)
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_CACHE_DIR = '.api_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 60 * 60
+
+def ergast_ttl_rules(current_year=None):
+    """TTL rules for the Ergast API: finished seasons never change"""
+    current_year = current_year or date.today().year
+    past_seasons = '|'.join(str(year) for year in range(1950, current_year))
+    return [
+        (rf'/f1/({past_seasons})(/|\.json|\?|$)', None),
+        (r'/f1/(circuits|seasons|status)(/|\.json|\?|$)', 24 * 60 * 60),
+    ]
+
+def normalize_url(url):
+    """Canonical cache key form: lower-case host, sorted query, no fragment"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+class ResponseCache:
+    """Disk-backed HTTP response cache.
+
+    Bodies are stored as files next to a SQLite index holding validators,
+    expiry and last access time. Stale entries are revalidated with
+    If-None-Match / If-Modified-Since, and the least recently used entries
+    are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl_rules=None, default_ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in
+                          (ergast_ttl_rules() if ttl_rules is None else ttl_rules)]
+        self.default_ttl = default_ttl
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'),
+                                   check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    def ttl_for(self, url):
+        """Seconds until a response for url goes stale, None if it never does"""
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def fetch(self, url, session=None):
+        """Return (body bytes, content type) for url, from disk when possible"""
+        url = normalize_url(url)
+        key = hashlib.sha256(url.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            entry = self._db.execute(
+                "SELECT content_type, etag, last_modified, expires_at FROM entries WHERE key = ?",
+                (key,)).fetchone()
+
+        if entry:
+            content_type, etag, last_modified, expires_at = entry
+            if expires_at is None or expires_at > now:
+                body = self._read_body(key)
+                if body is not None:
+                    with self._lock:
+                        self.stats['hits'] += 1
+                        self._touch(key, now)
+                    return body, content_type
+
+        # Imported here so that a cache hit never pays for loading requests
+        import requests
+
+        headers = {}
+        if entry and entry[1]:
+            headers['If-None-Match'] = entry[1]
+        if entry and entry[2]:
+            headers['If-Modified-Since'] = entry[2]
+
+        response = (session or requests).get(url, headers=headers)
+        if response.status_code == 304 and entry:
+            body = self._read_body(key)
+            if body is not None:
+                with self._lock:
+                    self.stats['revalidated'] += 1
+                    self._touch(key, now, self._expiry(url, now))
+                return body, entry[0]
+            # The body file went missing; fetch it again unconditionally
+            response = (session or requests).get(url)
+
+        response.raise_for_status()
+        body = response.content
+        content_type = response.headers.get('Content-Type', '')
+        with self._lock:
+            self.stats['misses'] += 1
+            self._store(key, url, body, content_type, response.headers, now)
+            self._evict()
+        return body, content_type
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            for (key,) in self._db.execute("SELECT key FROM entries").fetchall():
+                self._remove_body(key)
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def size(self):
+        """Total bytes of cached bodies"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _expiry(self, url, now):
+        ttl = self.ttl_for(url)
+        return None if ttl is None else now + ttl
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.body')
+
+    def _read_body(self, key):
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove_body(self, key):
+        try:
+            os.remove(self._body_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _touch(self, key, now, expires_at=False):
+        if expires_at is False:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        else:
+            self._db.execute("UPDATE entries SET last_access = ?, expires_at = ? WHERE key = ?",
+                             (now, expires_at, key))
+        self._db.commit()
+
+    def _store(self, key, url, body, content_type, headers, now):
+        path = self._body_path(key)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, len(body), content_type, headers.get('ETag'),
+             headers.get('Last-Modified'), self._expiry(url, now), now))
+        self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._remove_body(key)
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.stats['evictions'] += 1
+            total -= size
+        self._db.commit()
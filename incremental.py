@@ -0,0 +1,157 @@
+import os
+import pickle
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from genson import SchemaBuilder
+
+from compiler_5 import RelationalProcessor, fetch_api_data
+from pagination import fetch_all_pages
+
+DEFAULT_STATE_DIR = '.refresh_state'
+
+def find_races(data):
+    """Races list of an Ergast response, empty if there is none"""
+    mr_data = data.get('MRData', {}) if isinstance(data, dict) else {}
+    for key, value in mr_data.items():
+        if key.endswith('Table') and isinstance(value, dict):
+            return value.get('Races', [])
+    return []
+
+class ErgastRoundWatermark:
+    """(season, round) watermark for season-scoped Ergast endpoints such as 2024/results.
+
+    Newer data is fetched one round at a time after the stored round, up
+    to the last round of the season's schedule. Empty rounds are skipped,
+    since endpoints such as 2024/sprint have no data for most rounds.
+    """
+
+    URL_PATTERN = re.compile(r'^(?P<base>.*/f1/\d{4})/(?P<resource>[A-Za-z]+?)(?P<suffix>\.json)?$')
+
+    def watermark_of(self, data):
+        return max(((int(race['season']), int(race['round'])) for race in find_races(data)),
+                   default=None)
+
+    def newer_documents(self, api_url, watermark, fetch):
+        match = self.URL_PATTERN.match(api_url)
+        if not match:
+            raise ValueError(f"Not a season-scoped Ergast URL: {api_url}")
+
+        schedule = fetch(f"{match['base']}{match['suffix'] or ''}")
+        if schedule is None:
+            return
+        last_round = max((int(race['round']) for race in find_races(schedule)), default=0)
+
+        first_round = watermark[1] + 1 if watermark else 1
+        for number in range(first_round, last_round + 1):
+            data = fetch(f"{match['base']}/{number}/{match['resource']}{match['suffix'] or ''}")
+            # A failed round must not be passed over, or the watermark would skip it
+            if data is None:
+                return
+            if find_races(data):
+                yield data
+
+class RecordIdWatermark:
+    """Highest record id for feeds listed newest first, such as typeracer games.
+
+    The newest page is fetched first and earlier pages are requested with
+    before_param until a record at or below the watermark shows up.
+    """
+
+    def __init__(self, id_field='gn', before_param='beforeId'):
+        self.id_field = id_field
+        self.before_param = before_param
+
+    def watermark_of(self, data):
+        records = data if isinstance(data, list) else []
+        return max((r[self.id_field] for r in records if self.id_field in r), default=None)
+
+    def newer_documents(self, api_url, watermark, fetch):
+        parts = urlsplit(api_url)
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k != self.before_param]
+        url = urlunsplit(parts._replace(query=urlencode(query)))
+
+        while True:
+            records = fetch(url)
+            if not isinstance(records, list) or not records:
+                return
+            newer = [r for r in records
+                     if watermark is None or r.get(self.id_field, watermark) > watermark]
+            if newer:
+                yield newer
+            if len(newer) < len(records):
+                return
+            oldest = min(r[self.id_field] for r in records)
+            url = urlunsplit(parts._replace(
+                query=urlencode(query + [(self.before_param, oldest)])))
+
+class IncrementalRefresher:
+    """Keep relational tables up to date by fetching only records past a watermark.
+
+    The tables, key counters and merged schema of each endpoint are stored
+    next to its watermark, so later runs append new rows with surrogate
+    keys that continue where the previous run stopped.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR, cache=None, normalize=False, paginate=True):
+        self.state_dir = state_dir
+        self.cache = cache
+        self.normalize = normalize
+        self.paginate = paginate
+        os.makedirs(state_dir, exist_ok=True)
+
+    def fetch(self, api_url):
+        if self.paginate:
+            return fetch_all_pages(api_url, cache=self.cache)
+        return fetch_api_data(api_url, cache=self.cache)
+
+    def state_path(self, name):
+        return os.path.join(self.state_dir, re.sub(r'[^\w.-]', '_', name) + '.pkl')
+
+    def load_state(self, name):
+        try:
+            with open(self.state_path(name), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_state(self, name, state):
+        path = self.state_path(name)
+        with open(f'{path}.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+
+    def refresh(self, name, api_url, watermark):
+        """Append records newer than the stored watermark and return the full tables"""
+        state = self.load_state(name)
+        processor = RelationalProcessor(cache=self.cache, normalize=self.normalize)
+        builder = SchemaBuilder()
+        previous_mark = None
+        if state:
+            processor.restore_state(state['processor'])
+            builder.add_schema(state['schema'])
+            previous_mark = state['watermark']
+
+        rows_before = sum(len(table) for table in processor.tables.values())
+        current_mark = previous_mark
+        for data in watermark.newer_documents(api_url, previous_mark, self.fetch):
+            builder.add_object(data)
+            processor.analyze_schema(builder.to_schema())
+            processor.convert_to_relational(data)
+            mark = watermark.watermark_of(data)
+            if mark is not None and (current_mark is None or mark > current_mark):
+                current_mark = mark
+
+        new_rows = sum(len(table) for table in processor.tables.values()) - rows_before
+        self.save_state(name, {
+            'url': api_url,
+            'watermark': current_mark,
+            'schema': builder.to_schema(),
+            'processor': processor.export_state(),
+        })
+        print(f"✅ {name}: {new_rows} new rows, watermark {previous_mark} → {current_mark}")
+
+        result = processor.structure_output()
+        result['watermark'] = current_mark
+        result['new_rows'] = new_rows
+        return result
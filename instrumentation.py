@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+class Instrumentation:
+    """Hooks called around each processing stage; every hook is a no-op.
+
+    Subclass and override on_stage_start, on_stage_end and count to send
+    stage timings and counters elsewhere. A plain instance costs two clock
+    reads per stage.
+    """
+
+    trace_memory = False
+
+    @contextmanager
+    def stage(self, name, endpoint=None):
+        """Time a stage and report it to the hooks, with its tracemalloc peak if enabled"""
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        self.on_stage_start(name, endpoint)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - baseline if tracing else None
+            self.on_stage_end(name, endpoint, seconds, peak)
+
+    def on_stage_start(self, stage, endpoint):
+        pass
+
+    def on_stage_end(self, stage, endpoint, seconds, peak_bytes):
+        pass
+
+    def count(self, counter, amount=1, endpoint=None, table=None):
+        pass
+
+class StageProfiler(Instrumentation):
+    """Collect stage timings, tracemalloc peaks and counters per endpoint.
+
+    With trace_memory set, tracemalloc is started on first use; it slows the
+    traced code down noticeably, so leave it off when only timings matter.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'peak_bytes': None})
+        self.counters = defaultdict(int)
+        self.table_counters = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def on_stage_end(self, stage, endpoint, seconds, peak_bytes):
+        with self._lock:
+            stats = self.stages[(endpoint, stage)]
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            if peak_bytes is not None:
+                stats['peak_bytes'] = max(stats['peak_bytes'] or 0, peak_bytes)
+
+    def count(self, counter, amount=1, endpoint=None, table=None):
+        # Fetch threads of the paginator count bytes concurrently
+        with self._lock:
+            if table is None:
+                self.counters[(endpoint, counter)] += amount
+            else:
+                self.table_counters[(endpoint, counter)][table] += amount
+
+    def to_dict(self):
+        """Stages and counters grouped by endpoint, ready for JSON"""
+        endpoints = defaultdict(lambda: {'stages': {}, 'counters': {}})
+        for (endpoint, stage), stats in self.stages.items():
+            endpoints[endpoint or 'document']['stages'][stage] = dict(stats)
+        for (endpoint, counter), amount in self.counters.items():
+            endpoints[endpoint or 'document']['counters'][counter] = amount
+        for (endpoint, counter), tables in self.table_counters.items():
+            endpoints[endpoint or 'document']['counters'][counter] = dict(tables)
+        return {'endpoints': dict(endpoints)}
+
+    def export_json(self, path):
+        """Write the collected profile to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self):
+        """Text report of where the time went, slowest stage first for each endpoint"""
+        lines = []
+        for endpoint, profile in self.to_dict()['endpoints'].items():
+            total = sum(stats['seconds'] for stats in profile['stages'].values()) or 1.0
+            lines.append(f"\n📊 {endpoint}")
+            ranked = sorted(profile['stages'].items(), key=lambda item: -item[1]['seconds'])
+            for stage, stats in ranked:
+                peak = stats['peak_bytes']
+                memory = f"{peak / (1024 * 1024):9.2f} MB" if peak is not None else ' ' * 12
+                lines.append(f"   {stage:<10} {stats['seconds'] * 1000:10.2f} ms "
+                             f"{stats['seconds'] / total:6.1%} {memory}  x{stats['calls']}")
+            for counter, amount in profile['counters'].items():
+                if isinstance(amount, dict):
+                    amounts = ', '.join(f"{table}={n}" for table, n in amount.items())
+                    lines.append(f"   {counter}: {amounts}")
+                else:
+                    lines.append(f"   {counter}: {amount:,}")
+        return '\n'.join(lines)
+
+NO_INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,273 @@
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+from extraction_plan import KEY_COLUMN
+from spill import ChunkedTable
+
+INDEX_KINDS = ('hash', 'sorted')
+
+def table_columns(table):
+    """Column names of a result table: DataFrame, spilled view or Arrow table"""
+    if hasattr(table, 'column_names'):
+        return list(table.column_names)
+    return list(table.columns)
+
+def column_values(table, column):
+    """One column of a result table as a Series, reading only that column when it can"""
+    if isinstance(table, pd.DataFrame):
+        return table[column].reset_index(drop=True)
+    if isinstance(table, ChunkedTable):
+        return table.to_frame([column])[column].reset_index(drop=True)
+    return table.column(column).to_pandas()
+
+def parse_field(field):
+    """(table, column) of 'Table.column', or (table, None) for a whole table"""
+    table, _, column = field.partition('.')
+    return table, column or None
+
+def coerce_value(value, dtype):
+    """A filter value converted to a column's dtype, so '2' from the command line matches 2"""
+    if value is None:
+        return None
+    try:
+        if pd.api.types.is_bool_dtype(dtype):
+            return value if isinstance(value, bool) else str(value).lower() in ('true', '1')
+        if pd.api.types.is_numeric_dtype(dtype):
+            return pd.to_numeric(value) if isinstance(value, str) else value
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return pd.Timestamp(value)
+        if pd.api.types.is_timedelta64_dtype(dtype):
+            return pd.Timedelta(value)
+    except ValueError:
+        # Not a value of this type, so it matches no row
+        return value
+    # Text columns hold numbers as strings until dtypes are inferred, as in partition filters
+    return str(value)
+
+def filter_mask(series, condition):
+    """Rows of a column matching a filter: a value, a collection of values or a callable"""
+    if callable(condition):
+        return np.asarray(condition(series), dtype=bool)
+    values = list(condition) if isinstance(condition, (list, tuple, set, frozenset)) else [condition]
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return series.isin([coerce_value(v, dtype) for v in values]).to_numpy(dtype=bool)
+
+class KeyIndex:
+    """Row positions of a key column grouped by value, built once and probed many times.
+
+    A 'hash' index keeps a hash table of the distinct values, each pointing
+    at its run of rows; a 'sorted' index keeps the rows ordered by value
+    and probes with binary search. Null keys are left out, as they never
+    join.
+    """
+
+    def __init__(self, values, kind='hash'):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+        values = pd.Series(values)
+        valid = values.notna().to_numpy()
+        rows = np.flatnonzero(valid)
+        values = values.to_numpy()[valid]
+        self.kind = kind
+        if kind == 'hash':
+            codes, uniques = pd.factorize(values)
+            self.keys = pd.Index(uniques)
+            self.order = rows[np.argsort(codes, kind='stable')]
+            self.counts = np.bincount(codes, minlength=len(uniques))
+            self.starts = np.cumsum(self.counts) - self.counts
+            self.unique = len(uniques) == len(values)
+        else:
+            order = np.argsort(values, kind='stable')
+            self.order = rows[order]
+            self.sorted = values[order]
+            self.unique = not (self.sorted[1:] == self.sorted[:-1]).any()
+
+    def __len__(self):
+        return len(self.order)
+
+    def ranges(self, keys):
+        """Offset into the index order and number of matching rows for every probe key"""
+        if not len(self.order):
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=np.int64)
+        if self.kind == 'hash':
+            slots = self.keys.get_indexer(keys)
+            found = slots >= 0
+            return np.where(found, self.starts[slots], 0), np.where(found, self.counts[slots], 0)
+        starts = np.searchsorted(self.sorted, keys, 'left')
+        return starts, np.searchsorted(self.sorted, keys, 'right') - starts
+
+    def lookup(self, keys):
+        """(probe positions, row positions) of every match, in probe order"""
+        keys = np.asarray(keys)
+        starts, counts = self.ranges(keys)
+        if self.unique:
+            probe = np.flatnonzero(counts)
+            return probe, self.order[starts[probe]]
+        probe = np.repeat(np.arange(len(keys)), counts)
+        offsets = np.arange(len(probe)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return probe, self.order[np.repeat(starts, counts) + offsets]
+
+class JoinEngine:
+    """Joins across the tables of a relational result along its relationship catalog.
+
+    Works on results from RelationalProcessor, spilled or not, and on
+    datasets from arrow_store.open_dataset. Indexes on key and foreign key
+    columns are built the first time a join needs them and kept for the
+    life of the engine, so repeated queries never rebuild them.
+
+    join() connects the requested tables through the shortest paths in the
+    relationship graph, adding the tables in between. Filters are applied
+    to each table before anything is joined; the join starts from the
+    table with the fewest rows left and carries only row positions through
+    the hops, so columns are gathered once, for the final rows.
+    """
+
+    def __init__(self, result, index_kind='hash'):
+        if index_kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {index_kind}")
+        self.tables = result['tables']
+        self.relationships = result['relationships']
+        self.index_kind = index_kind
+        self.indexes = {}
+        self.values = {}
+        self.stats = {'indexes_built': 0, 'index_reuses': 0, 'joins': 0}
+        self.neighbours = defaultdict(list)
+        for relationship in self.relationships:
+            parent, child = relationship['parent'], relationship['child']
+            if parent in self.tables and child in self.tables and parent != child:
+                self.neighbours[parent].append((child, relationship))
+                self.neighbours[child].append((parent, relationship))
+
+    def table(self, name):
+        if name not in self.tables:
+            raise KeyError(f"Unknown table: {name}")
+        return self.tables[name]
+
+    def column(self, table, column):
+        """Cached column of a table"""
+        values = self.values.get((table, column))
+        if values is None:
+            if column not in table_columns(self.table(table)):
+                raise KeyError(f"Unknown column: {table}.{column}")
+            values = self.values[(table, column)] = column_values(self.tables[table], column)
+        return values
+
+    def index(self, table, column):
+        """Index on a key column, built on first use"""
+        index = self.indexes.get((table, column))
+        if index is None:
+            index = self.indexes[(table, column)] = KeyIndex(self.column(table, column),
+                                                              self.index_kind)
+            self.stats['indexes_built'] += 1
+        else:
+            self.stats['index_reuses'] += 1
+        return index
+
+    def path(self, sources, target):
+        """Shortest chain of (from table, to table, relationship) hops from any source to target"""
+        sources = set(sources)
+        came_from = {source: None for source in sources}
+        pending = deque(sorted(sources))
+        while pending:
+            table = pending.popleft()
+            if table == target:
+                hops = []
+                while came_from[table] is not None:
+                    previous, relationship = came_from[table]
+                    hops.append((previous, table, relationship))
+                    table = previous
+                return hops[::-1]
+            for neighbour, relationship in self.neighbours[table]:
+                if neighbour not in came_from:
+                    came_from[neighbour] = (table, relationship)
+                    pending.append(neighbour)
+        raise ValueError(f"No relationship path from {', '.join(sorted(sources))} to {target}")
+
+    def join_tree(self, tables):
+        """Tables and relationships connecting every requested table, including those in between"""
+        for name in tables:
+            self.table(name)
+        connected = [tables[0]]
+        edges = []
+        for name in tables[1:]:
+            if name in connected:
+                continue
+            for _, table, relationship in self.path(connected, name):
+                connected.append(table)
+                edges.append(relationship)
+        return connected, edges
+
+    def candidates(self, where):
+        """Rows of each filtered table that pass its filters, before any join"""
+        masks = {}
+        for field, condition in (where or {}).items():
+            table, column = parse_field(field)
+            if column is None:
+                raise ValueError(f"Filter needs a Table.column field: {field}")
+            mask = filter_mask(self.column(table, column), condition)
+            masks[table] = masks[table] & mask if table in masks else mask
+        return masks
+
+    def join(self, select, where=None):
+        """Join the tables named in select and where into one DataFrame.
+
+        select lists 'Table.column' fields, or bare table names for all of a
+        table's columns; output columns are named 'Table.column'. where maps
+        'Table.column' to a value, a collection of values, or a callable
+        taking the column and returning a boolean mask. Rows are those of
+        an inner join along the relationships.
+        """
+        fields = [parse_field(field) for field in select]
+        tables = list(dict.fromkeys([table for table, _ in fields] +
+                                    [parse_field(field)[0] for field in where or {}]))
+        if not tables:
+            raise ValueError("Nothing selected")
+        connected, edges = self.join_tree(tables)
+        masks = self.candidates(where)
+        sizes = {name: int(masks[name].sum()) if name in masks else len(self.tables[name])
+                 for name in connected}
+
+        start = min(connected, key=lambda name: sizes[name])
+        positions = {start: np.flatnonzero(masks[start]) if start in masks
+                     else np.arange(sizes[start])}
+        remaining = list(edges)
+        while remaining:
+            # The most selective table reachable from the joined ones goes next
+            hops = [(relationship, relationship['child'] if relationship['parent'] in positions
+                     else relationship['parent'])
+                    for relationship in remaining
+                    if (relationship['parent'] in positions) != (relationship['child'] in positions)]
+            relationship, table = min(hops, key=lambda hop: sizes[hop[1]] /
+                                      max(1, len(self.tables[hop[1]])))
+            remaining.remove(relationship)
+            positions = self.hop(positions, relationship, table, masks.get(table))
+        self.stats['joins'] += 1
+
+        columns = {}
+        for table, column in fields:
+            names = [column] if column is not None else table_columns(self.tables[table])
+            for name in names:
+                values = self.column(table, name)
+                columns[f'{table}.{name}'] = values.array.take(positions[table])
+        return pd.DataFrame(columns, index=pd.RangeIndex(len(positions[start])))
+
+    def hop(self, positions, relationship, table, mask=None):
+        """Extend joined row positions with the matching rows of one more table"""
+        parent, child, foreign_key = (relationship['parent'], relationship['child'],
+                                      relationship['foreign_key'])
+        if table == parent:
+            keys = self.column(child, foreign_key).to_numpy()[positions[child]]
+            probe, rows = self.index(parent, KEY_COLUMN).lookup(keys)
+        else:
+            keys = self.column(parent, KEY_COLUMN).to_numpy()[positions[parent]]
+            probe, rows = self.index(child, foreign_key).lookup(keys)
+        if mask is not None:
+            keep = mask[rows]
+            probe, rows = probe[keep], rows[keep]
+        joined = {name: rows_of[probe] for name, rows_of in positions.items()}
+        joined[table] = rows
+        return joined
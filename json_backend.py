@@ -0,0 +1,121 @@
+import gc
+import json
+import threading
+from contextlib import contextmanager
+
+# Decoders in order of preference; the first one installed is the default
+BACKENDS = ('orjson', 'ujson', 'stdlib')
+
+_backend = None
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+def stdlib_codec():
+    def dumps(obj):
+        # Raw UTF-8 rather than \u escapes, byte for byte what orjson writes
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+    return json.loads, dumps
+
+def orjson_codec():
+    import orjson
+    return orjson.loads, orjson.dumps
+
+def ujson_codec():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode()
+    return ujson.loads, dumps
+
+CODECS = {'orjson': orjson_codec, 'ujson': ujson_codec, 'stdlib': stdlib_codec}
+
+def load_codec(name):
+    """(loads, dumps) of a backend, raising ImportError when it is not installed"""
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    return CODECS[name]()
+
+def available_backends():
+    """Installed backends, fastest first"""
+    available = []
+    for name in BACKENDS:
+        try:
+            load_codec(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+def set_backend(name=None):
+    """Use the named backend for loads() and dumps(); None picks the fastest installed.
+
+    The choice is per process: spawned workers pick the default again.
+    """
+    global _backend
+    name = name or available_backends()[0]
+    _backend = (name, *load_codec(name))
+    return name
+
+def backend_name():
+    if _backend is None:
+        set_backend()
+    return _backend[0]
+
+@contextmanager
+def gc_paused():
+    """Pause cyclic garbage collection, also while other threads are decoding.
+
+    A decoded document is a tree without reference cycles, but building
+    millions of containers keeps triggering full collections, which can
+    cost more than the parsing itself.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+def loads(data):
+    """Decode a JSON document straight from the response bytes.
+
+    orjson and ujson parse bytes without building a str first. Documents
+    they reject but the stdlib accepts (integers beyond 64 bits, NaN) are
+    decoded again with the stdlib, so every backend reads what json does.
+    """
+    if _backend is None:
+        set_backend()
+    name, decode, _ = _backend
+    with gc_paused():
+        try:
+            return decode(data)
+        except ValueError:
+            if name == 'stdlib':
+                raise
+            return json.loads(data)
+
+def dumps(obj):
+    """Compact UTF-8 encoding of a document, as bytes"""
+    if _backend is None:
+        set_backend()
+    name, _, encode = _backend
+    try:
+        return encode(obj)
+    except (TypeError, ValueError, OverflowError):
+        if name == 'stdlib':
+            raise
+        return stdlib_codec()[1](obj)
+
+def accept_encoding():
+    """Accept-Encoding value for every compression urllib3 can decode here"""
+    from urllib3.util import make_headers
+
+    return make_headers(accept_encoding=True)['accept-encoding']
@@ -0,0 +1,193 @@
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONStreamReader:
+    """Pull-style JSON reader over an iterator of byte chunks.
+
+    Objects and arrays are walked token by token so callers can descend into
+    large containers without holding them; every other value is decoded whole
+    with the stdlib decoder once its bytes have arrived.
+    """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._text = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_chars=1):
+        """Buffer at least min_chars unread characters, False if input ends first"""
+        text = self._text[self._pos:]
+        self._pos = 0
+        parts = [text]
+        size = len(text)
+        while size < min_chars and not self._eof:
+            try:
+                chunk = self._decoder.decode(next(self._chunks))
+            except StopIteration:
+                self._eof = True
+                chunk = self._decoder.decode(b'', final=True)
+            parts.append(chunk)
+            size += len(chunk)
+        self._text = ''.join(parts)
+        return size >= min_chars
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end)"""
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._fill():
+                return ''
+
+    def _consume(self, expected):
+        found = self.peek()
+        if found not in expected or not found:
+            raise ValueError(f"Expected one of {expected!r} in JSON stream, got {found!r}")
+        self._pos += 1
+        return found
+
+    def read_value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                end = None
+            # A number at the end of the buffer may continue in the next chunk
+            if end is not None and (end < len(self._text) or self._eof):
+                self._pos = end
+                return value
+            # Grow geometrically so large values are not re-decoded per chunk
+            self._fill(2 * (len(self._text) - self._pos) + 1)
+
+    def skip_value(self):
+        """Consume the next JSON value without returning it"""
+        self.read_value()
+
+    def iter_object(self):
+        """Walk an object, yielding each key; the caller must consume its value"""
+        self._consume('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected object key in JSON stream, got {key!r}")
+            self._consume(':')
+            yield key
+            if self._consume(',}') == '}':
+                return
+
+    def iter_array(self):
+        """Walk an array, yielding element indexes; the caller must consume each element"""
+        self._consume('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._consume(',]') == ']':
+                return
+
+class StructureIndex:
+    """Byte offsets of the brackets and commas of a complete JSON body.
+
+    One vectorised pass over the bytes finds the quotes, leaves out the
+    marks inside strings and works out the nesting level of the rest, so
+    the byte span of any value reached through keys and array items can be
+    found without decoding it. Levels count the containers around a mark's
+    content: the brackets of the root value and the commas between its
+    items are all at level 1.
+    """
+
+    def __init__(self, body):
+        import numpy as np
+
+        self.body = body
+        buf = np.frombuffer(body, dtype=np.uint8)
+        quotes = np.flatnonzero(buf == ord('"'))
+        # A quote is escaped when an odd run of backslashes comes right before it
+        escaped = []
+        for q in quotes[buf[quotes - 1] == ord('\\')].tolist():
+            run = 0
+            while q - 1 - run >= 0 and body[q - 1 - run] == ord('\\'):
+                run += 1
+            if run % 2:
+                escaped.append(q)
+        if escaped:
+            keep = np.ones(len(quotes), dtype=bool)
+            keep[np.searchsorted(quotes, escaped)] = False
+            quotes = quotes[keep]
+        self.quotes = quotes
+
+        # '[' and '{' differ only in bit 0x20, as do ']' and '}'
+        folded = buf | 0x20
+        marks = np.flatnonzero((folded == ord('{')) | (folded == ord('}')) | (buf == ord(',')))
+        # Outside strings an even number of quotes comes before a mark
+        marks = marks[np.searchsorted(quotes, marks) % 2 == 0]
+        chars = buf[marks]
+        self.steps = np.where((chars == ord('[')) | (chars == ord('{')), 1,
+                              np.where(chars == ord(','), 0, -1)).astype(np.int8)
+        self.levels = np.cumsum(self.steps, dtype=np.int32) + (self.steps == -1)
+        self.marks = marks
+        self._by_level = {}
+
+    def level_marks(self, level):
+        """Offsets of the opening brackets, closing brackets and commas at one level"""
+        found = self._by_level.get(level)
+        if found is None:
+            at_level = self.levels == level
+            found = self._by_level[level] = tuple(self.marks[at_level & (self.steps == step)]
+                                                  for step in (1, -1, 0))
+        return found
+
+    def value_start(self, start, end=None):
+        """Offset of the first byte of a value that starts after whitespace at start"""
+        while start < (len(self.body) if end is None else end) and self.body[start] in b' \t\n\r':
+            start += 1
+        return start
+
+    def bounds(self, start):
+        """Separators of the container opening at start: item i lies between bounds i and i + 1.
+
+        The first bound is the opening bracket, the last the closing one and
+        the ones between are the commas; an empty container gets the opening
+        bracket alone.
+        """
+        import numpy as np
+
+        level = int(self.levels[np.searchsorted(self.marks, start)])
+        opens, closes, commas = self.level_marks(level)
+        close = int(closes[np.searchsorted(opens, start)])
+        inner = commas[np.searchsorted(commas, start):np.searchsorted(commas, close)]
+        if not inner.size and self.value_start(start + 1, close) == close:
+            return np.array([start], dtype=np.int64)
+        return np.concatenate(([start], inner, [close]))
+
+    def member(self, start, key):
+        """Offset of the value of key in the object opening at start, None when it is missing"""
+        import numpy as np
+
+        bounds = self.bounds(start).tolist()
+        found = None
+        for begin, end in zip(bounds, bounds[1:]):
+            first = int(self.quotes[np.searchsorted(self.quotes, begin)])
+            last = int(self.quotes[np.searchsorted(self.quotes, first, 'right')])
+            # Later duplicates win, as they do when the body is decoded
+            if json.loads(self.body[first:last + 1]) == key:
+                found = self.value_start(self.body.index(b':', last) + 1, end)
+        return found
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import json_backend
+
+# Largest page size the Ergast mirror serves
+ERGAST_PAGE_LIMIT = 100
+
+def create_session(pool_size=8):
+    """Create a session whose keep-alive pool can serve pool_size concurrent requests"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = json_backend.accept_encoding()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def page_url(api_url, limit, offset):
+    """Build the JSON URL for one page of an endpoint"""
+    parts = urlsplit(api_url)
+    query = dict(parse_qsl(parts.query))
+    query.update(format='json', limit=limit, offset=offset)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def plan_offsets(total, limit):
+    """Offsets of every page after the first one"""
+    return list(range(limit, total, limit))
+
+def fetch_page(session, api_url, limit, offset, cache=None, instrumentation=None):
+    """Fetch and decode a single page"""
+    url = page_url(api_url, limit, offset)
+    if cache is not None:
+        body, content_type = cache.fetch(url, session)
+    else:
+        response = session.get(url)
+        response.raise_for_status()
+        body = response.content
+        content_type = response.headers.get('Content-Type', '')
+        if instrumentation is not None:
+            instrumentation.count('bytes_transferred', response.raw.tell(), endpoint=api_url)
+
+    if 'json' not in content_type:
+        raise ValueError(f"Unexpected content type: {content_type}")
+
+    if instrumentation is not None:
+        instrumentation.count('bytes_fetched', len(body), endpoint=api_url)
+    return json_backend.loads(body)
+
+def fetch_all_pages(api_url, limit=ERGAST_PAGE_LIMIT, max_workers=8, session=None, cache=None,
+                    instrumentation=None):
+    """Fetch every page of an endpoint concurrently and merge them in order.
+
+    The first page supplies MRData.total; the remaining offsets are then
+    fetched in parallel over one pooled session.
+    """
+    import requests
+
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+    try:
+        merged = fetch_page(session, api_url, limit, 0, cache, instrumentation)
+        meta = merged.get('MRData', {}) if isinstance(merged, dict) else {}
+        total = int(meta.get('total', 0))
+        # The server may cap the page size below what was asked for
+        limit = int(meta.get('limit', limit)) or limit
+        offsets = plan_offsets(total, limit)
+
+        if offsets:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pages = executor.map(
+                    lambda offset: fetch_page(session, api_url, limit, offset, cache, instrumentation),
+                    offsets)
+                for page in pages:
+                    merge_pages(merged, page)
+            meta['limit'] = str(total)
+
+        print(f"✅ Fetched {len(offsets) + 1} page(s), {total} records")
+        return merged
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"❌ API request failed: {str(e)}")
+        return None
+    finally:
+        if own_session:
+            session.close()
+
+def merge_pages(merged, page):
+    """Append the records of one page onto the merged document in place"""
+    for key, value in page.items():
+        current = merged.get(key)
+        if isinstance(current, list) and isinstance(value, list):
+            extend_records(current, value)
+        elif isinstance(current, dict) and isinstance(value, dict):
+            merge_pages(current, value)
+    return merged
+
+def extend_records(records, page_records):
+    """Extend a record list, re-joining a record that was split across pages.
+
+    Ergast pages by result rows, so the last race of one page and the first
+    race of the next can be the same race carrying different results.
+    """
+    if records and page_records and same_record(records[-1], page_records[0]):
+        merge_pages(records[-1], page_records[0])
+        page_records = page_records[1:]
+    records.extend(page_records)
+
+def same_record(a, b):
+    """Records match when they carry the same scalar attributes"""
+    if not (isinstance(a, dict) and isinstance(b, dict)):
+        return False
+    scalars_a = {k: v for k, v in a.items() if not isinstance(v, (dict, list))}
+    scalars_b = {k: v for k, v in b.items() if not isinstance(v, (dict, list))}
+    return bool(scalars_a) and scalars_a == scalars_b
@@ -0,0 +1,432 @@
+import itertools
+from array import array
+from collections import defaultdict
+
+import json_backend
+from columnar import ColumnarTable, ObjectColumn
+from extraction_plan import KEY_COLUMN, get_extraction_plan
+
+# Tasks handed out per worker, so one slow chunk does not hold up the rest
+TASKS_PER_WORKER = 4
+# Below this many estimated rows, starting the workers costs more than it saves
+MIN_PARALLEL_ROWS = 100_000
+# Items of each array counted to estimate its rows
+ESTIMATE_SAMPLE = 16
+
+def iter_entities(plan):
+    """Every EntityPlan reachable from a plan's tables"""
+    pending = [table.entity for table in plan.tables if table.entity is not None]
+    while pending:
+        entity = pending.pop()
+        yield entity
+        pending.extend(child for _, _, child in entity.children)
+        pending.extend(dimension for _, _, dimension in entity.dimensions)
+
+def table_links(plan):
+    """For every table, its foreign key columns and the tables they point to"""
+    parents = defaultdict(set)
+    dimensions = defaultdict(set)
+    for entity in iter_entities(plan):
+        if entity.parent:
+            parents[entity.name].add((entity.parent_column, entity.parent))
+        for _, column, dimension in entity.dimensions:
+            dimensions[entity.name].add((column, dimension.name))
+    return parents, dimensions
+
+def iter_entity_lists(node, value, index, start):
+    """(entity plan, items, item bounds) for every entity array below a trie node, in PathTrie.walk order.
+
+    value is the decoded value starting at offset start of the indexed body.
+    """
+    if node.table is not None:
+        if isinstance(value, list):
+            yield node.table.entity, value, index.bounds(start)
+    elif isinstance(value, dict):
+        for key, child in node.children.items():
+            if key in value:
+                yield from iter_entity_lists(child, value[key], index, index.member(start, key))
+    elif isinstance(value, list):
+        child = node.children.get('items')
+        if child is not None:
+            bounds = index.bounds(start).tolist()
+            for i, item in enumerate(value):
+                yield from iter_entity_lists(child, item, index, index.value_start(bounds[i] + 1))
+
+def entity_tables(entity, skip=None):
+    """Names of the tables storing an entity writes to, leaving out the child array skip"""
+    names = {entity.name}
+    for _, _, dimension in entity.dimensions:
+        names |= entity_tables(dimension)
+    for source, _, child in entity.children:
+        if source != skip:
+            names |= entity_tables(child)
+    return names
+
+def creation_order(entity, segments):
+    """Tables in the order storing the segments one item at a time would create them"""
+    total = len(entity_tables(entity))
+    seen = {}
+
+    def visit(plan, item):
+        seen.setdefault(plan.name)
+        if len(seen) == total or not isinstance(item, dict):
+            return
+        for source, _, dimension in plan.dimensions:
+            if item.get(source) is not None:
+                visit(dimension, item[source])
+        for source, is_list, child in plan.children:
+            value = item.get(source)
+            for v in (value if is_list else [value]) if value is not None else ():
+                visit(child, v)
+                if len(seen) == total:
+                    return
+
+    for _, items, _ in segments:
+        for item in items:
+            if isinstance(item, dict):
+                visit(entity, item)
+            if len(seen) == total:
+                return list(seen)
+    return list(seen)
+
+def count_rows(entity, item):
+    """Rows that storing one item adds to its table and the tables nested below it"""
+    rows = 1
+    for source, is_list, child in entity.children:
+        value = item.get(source)
+        if is_list:
+            rows += sum(count_rows(child, v) for v in value or () if isinstance(v, dict))
+        elif isinstance(value, dict):
+            rows += count_rows(child, value)
+    return rows
+
+def estimate_rows(entity, items):
+    """Rows an entity array will produce, from an evenly spaced sample of its items"""
+    if not items:
+        return 0
+    sample = items[::max(1, len(items) // ESTIMATE_SAMPLE)]
+    counted = sum(count_rows(entity, item) for item in sample if isinstance(item, dict))
+    return counted * len(items) // len(sample)
+
+def store_segments(processor, entity, segments):
+    for parent_key, items, _ in segments:
+        for item in items:
+            if isinstance(item, dict):
+                entity.store(processor, item, parent_key)
+
+def split_level(processor, entity, segments, min_items, index):
+    """Find the level of an entity table worth splitting, storing the levels above it.
+
+    segments are the (parent key, items, item bounds) arrays of the table,
+    with the bounds taken from the body's StructureIndex. A short array
+    of large items (one race with thousands of laps) is not split itself:
+    its rows are stored here without their largest child array, and the
+    search moves down into that array. That only happens while the tables
+    stored here and the tables below the child array are disjoint, so
+    every table still receives its rows, and dimension contents their
+    keys, in document order. Returns the entity plan and segments to hand
+    out, or None when nothing was big enough and everything has been
+    stored.
+    """
+    stored_above = set()
+    while True:
+        if sum(len(items) for _, items, _ in segments) >= min_items:
+            return entity, segments
+        totals = {source: sum(len(item.get(source) or ()) for _, items, _ in segments
+                              for item in items if isinstance(item, dict))
+                  for source, is_list, _ in entity.children if is_list}
+        source = max(totals, key=totals.get, default=None)
+        child = next((plan for name, _, plan in entity.children if name == source), None)
+        stored = stored_above | entity_tables(entity, skip=source)
+        if child is None or not totals[source] or stored & entity_tables(child):
+            store_segments(processor, entity, segments)
+            return None
+
+        if not stored_above:
+            # Create the tables in the order a sequential run would, before the lower levels
+            for name in creation_order(entity, segments):
+                processor.get_table(name)
+        stored_above = stored
+        below = []
+        for parent_key, items, bounds in segments:
+            bounds = bounds.tolist()
+            for i, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                key = entity.store(processor, {k: v for k, v in item.items() if k != source},
+                                   parent_key)
+                if item.get(source):
+                    start = index.member(index.value_start(bounds[i] + 1), source)
+                    below.append((key, item[source], index.bounds(start)))
+        entity, segments = child, below
+
+def chunk_segments(segments, num_tasks):
+    """Cut segments into num_tasks runs of about equal length, in order.
+
+    A run is a list of (parent key, first bound, last bound), the items
+    between the two bounds being one slice of the body.
+    """
+    total = sum(len(items) for _, items, _ in segments)
+    size = -(-total // num_tasks)
+    task, filled = [], 0
+    for parent_key, items, bounds in segments:
+        start = 0
+        while start < len(items):
+            take = min(size - filled, len(items) - start)
+            task.append((parent_key, int(bounds[start]), int(bounds[start + take])))
+            filled += take
+            start += take
+            if filled == size:
+                yield task
+                task, filled = [], 0
+    if task:
+        yield task
+
+class ChunkProcessor:
+    """The part of RelationalProcessor that EntityPlan.store writes to, for one chunk"""
+
+    def __init__(self, column_types):
+        self.column_types = column_types
+        self.tables = {}
+        self.last_keys = defaultdict(int)
+        self.dimension_keys = defaultdict(dict)
+
+    def get_table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = ColumnarTable(self.column_types.get(name))
+        return table
+
+_worker = {}
+
+def init_worker(schema, normalize, projection):
+    plan = get_extraction_plan(schema, normalize, projection)
+    _worker['plan'] = plan
+    _worker['entities'] = {entity.path: entity for entity in iter_entities(plan)}
+
+def write_task(body, task):
+    """Shared memory block holding a run as a JSON list of [parent key, items], cut from the body"""
+    from multiprocessing import shared_memory
+
+    view = memoryview(body)
+    pieces = [b'[']
+    for n, (parent_key, first, last) in enumerate(task):
+        key = b'null' if parent_key is None else b'%d' % parent_key
+        pieces += [b'%s[%s,[' % (b',' if n else b'', key), view[first + 1:last], b']]']
+    pieces.append(b']')
+    size = sum(len(piece) for piece in pieces)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    offset = 0
+    for piece in pieces:
+        shm.buf[offset:offset + len(piece)] = piece
+        offset += len(piece)
+    return shm, size
+
+def extract_task(shm_name, size, path):
+    """Store one chunk of entities read from shared memory, with keys counted from 1"""
+    from multiprocessing import shared_memory
+
+    # Spawned workers share the parent's resource tracker, which unlinks the block
+    shm = shared_memory.SharedMemory(shm_name)
+    try:
+        segments = json_backend.loads(bytes(shm.buf[:size]))
+    finally:
+        shm.close()
+
+    entity = _worker['entities'][path]
+    chunk = ChunkProcessor(_worker['plan'].column_types)
+    for parent_key, items in segments:
+        for item in items:
+            if isinstance(item, dict):
+                entity.store(chunk, item, parent_key)
+    return chunk.tables, dict(chunk.dimension_keys)
+
+def dependency_order(names, parents, dimensions):
+    """Tables of a chunk ordered so referenced tables come before the tables pointing at them"""
+    names = list(names)
+    present = set(names)
+    after = {name: {table for _, table in parents[name] | dimensions[name]
+                    if table in present and table != name} for name in names}
+    ordered = []
+    while names:
+        ready = [name for name in names if not after[name] - set(ordered)]
+        # A cycle only comes from two tables sharing a name; keep the creation order
+        for name in ready or names[:1]:
+            ordered.append(name)
+            names.remove(name)
+    return ordered
+
+def filter_buffer(buffer, keep):
+    import numpy as np
+
+    if isinstance(buffer, list):
+        return list(itertools.compress(buffer, keep.tolist()))
+    if isinstance(buffer, array):
+        return array(buffer.typecode, np.frombuffer(buffer, dtype=buffer.typecode)[keep].tobytes())
+    return bytearray(np.frombuffer(buffer, dtype=np.uint8)[keep].tobytes())
+
+def filter_rows(table, keep):
+    """Table with only the rows where keep is set"""
+    filtered = ColumnarTable(table.column_types)
+    for name, column in table.columns.items():
+        copy = type(column).__new__(type(column))
+        for attribute, buffer in vars(column).items():
+            setattr(copy, attribute, filter_buffer(buffer, keep))
+        filtered.columns[name] = copy
+    filtered.num_rows = int(keep.sum())
+    return filtered
+
+def key_array(column):
+    """Keys of an int column as int64, with 0 (never a key) where it is null"""
+    import numpy as np
+
+    if type(column) is ObjectColumn:
+        return np.array([0 if v is None else v for v in column.values], dtype=np.int64)
+    return np.frombuffer(column.values, dtype=np.int64)
+
+def remap_keys(column, mapping):
+    """Replace chunk-local keys in an int column with their global keys"""
+    import numpy as np
+
+    if type(column) is ObjectColumn:
+        column.values = [None if v is None else int(mapping[v]) for v in column.values]
+    else:
+        local = np.frombuffer(column.values, dtype=np.int64)
+        column.values = array('q', mapping[local].tobytes())
+
+def merge_chunk(processor, tables, dimension_keys, parents, dimensions):
+    """Append a chunk's tables to the processor, as if its entities had been stored there.
+
+    Chunk keys count from 1 in every table, so each table's rows get the
+    next global keys in order and every foreign key inside the chunk is
+    rewritten through the referenced table's mapping. Dimension rows
+    already known by content are dropped in favour of the existing key,
+    together with the rows nested below them. Null foreign keys stay null
+    and never drop a row. Foreign keys to tables outside the chunk were
+    global all along.
+    """
+    import numpy as np
+
+    # Create new tables in the order the chunk created them, as a sequential run would
+    for name in tables:
+        processor.get_table(name)
+
+    mappings = {}
+    kept_keys = {}
+    for name in dependency_order(tables, parents, dimensions):
+        table = tables[name]
+        keep = np.ones(table.num_rows, dtype=bool)
+        mapping = np.zeros(table.num_rows + 1, dtype=np.int64)
+
+        local_index = dimension_keys.get(name, {})
+        index = processor.dimension_keys[name] if local_index else {}
+        for digest, key in local_index.items():
+            existing = index.get(digest)
+            if existing is not None:
+                keep[key - 1] = False
+                mapping[key] = existing
+
+        # A table can hang off several parents; a row's null keys for the others never drop it
+        for column, parent in parents[name]:
+            if parent in kept_keys and column in table.columns:
+                local = key_array(table.columns[column])
+                keep &= kept_keys[parent][local] | (local == 0)
+
+        start = processor.last_keys[name]
+        new_keys = start + np.cumsum(keep)
+        mapping[1:][keep] = new_keys[keep]
+        processor.last_keys[name] = start + int(keep.sum())
+        for digest, key in local_index.items():
+            if keep[key - 1]:
+                index[digest] = int(mapping[key])
+        mappings[name] = mapping
+        kept_keys[name] = np.concatenate(([False], keep))
+
+        remap_keys(table.columns[KEY_COLUMN], mapping)
+        for column, referenced in parents[name] | dimensions[name]:
+            if referenced in mappings and column in table.columns and referenced != name:
+                remap_keys(table.columns[column], mappings[referenced])
+        processor.get_table(name).extend(filter_rows(table, keep))
+
+def iter_tasks(processor, arrays, min_items, merge_pending, index):
+    """(entity path, segments) chunks to extract elsewhere, storing unsplit levels on the way.
+
+    Chunks handed out earlier are merged before anything is stored here,
+    so rows keep document order across arrays.
+    """
+    for entity, segments in arrays:
+        if sum(len(items) for _, items, _ in segments) < min_items:
+            merge_pending()
+        found = split_level(processor, entity, segments, min_items, index)
+        if found is not None:
+            entity, segments = found
+            for task in chunk_segments(segments, min_items):
+                yield entity.path, task
+
+def extract_parallel(processor, data, workers, body=None, min_rows=None):
+    """Convert a document like ExtractionPlan.extract, with the big arrays split over processes.
+
+    body is the raw JSON that data was decoded from. Each entity array with
+    enough items is cut into ordered runs, and every run is copied as a
+    slice of the body into its own shared memory block, which its worker
+    decodes: nothing the parent has decoded is encoded or pickled again.
+    The chunk tables are merged in submission order with rebased keys,
+    which makes the result identical to a sequential run. Documents
+    without a body, such as merged pages, and documents estimated below
+    min_rows rows (MIN_PARALLEL_ROWS by default) are extracted in this
+    process.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from json_stream import StructureIndex
+
+    plan = processor.plan
+    if body is None:
+        plan.extract(processor, data)
+        return
+    index = StructureIndex(body)
+    # Consecutive arrays of the same table are split together, keeping document order
+    arrays = []
+    for entity, items, bounds in iter_entity_lists(plan.trie, data, index, index.value_start(0)):
+        if not arrays or arrays[-1][0] is not entity:
+            arrays.append((entity, []))
+        arrays[-1][1].append((None, items, bounds))
+    rows = sum(estimate_rows(entity, items) for entity, segments in arrays
+               for _, items, _ in segments)
+    if rows < (MIN_PARALLEL_ROWS if min_rows is None else min_rows):
+        plan.extract(processor, data)
+        return
+
+    parents, dimensions = table_links(plan)
+    submitted = []
+
+    def merge_pending():
+        """Merge every chunk handed out so far, in submission order"""
+        while submitted:
+            shm, future = submitted[0]
+            tables, dimension_keys = future.result()
+            submitted.pop(0)
+            shm.close()
+            shm.unlink()
+            merge_chunk(processor, tables, dimension_keys, parents, dimensions)
+            if processor.spill is not None:
+                processor.spill.check()
+
+    tasks = iter_tasks(processor, arrays, workers * TASKS_PER_WORKER, merge_pending, index)
+    first = next(tasks, None)
+    if first is None:
+        return
+
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                 initargs=(plan.schema, plan.normalize, plan.projection)) as pool:
+            for path, task in itertools.chain([first], tasks):
+                shm, size = write_task(body, task)
+                submitted.append((shm, pool.submit(extract_task, shm.name, size, path)))
+            merge_pending()
+    finally:
+        for shm, _ in submitted:
+            shm.close()
+            shm.unlink()
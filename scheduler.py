@@ -0,0 +1,267 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+INTERACTIVE = 0
+BATCH = 10
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class HostLimiter:
+    """Token bucket plus in-flight cap for one host, adapted to how the host responds.
+
+    Throttling or server errors halve both the rate and the concurrency;
+    every run of successes raises them again additively, up to the
+    configured ceilings.
+    """
+
+    def __init__(self, rate, burst, max_in_flight, increase_after=10):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.max_in_flight = max_in_flight
+        self.in_flight_limit = max_in_flight
+        self.in_flight = 0
+        self.successes = 0
+        self.increase_after = increase_after
+
+    def acquire(self, now):
+        """Take a token if one is free now; otherwise return the seconds until one is"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def throttled(self, now, retry_after=None):
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+        self.in_flight_limit = max(1, self.in_flight_limit // 2)
+        self.successes = 0
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def succeeded(self):
+        self.successes += 1
+        if self.successes >= self.increase_after:
+            self.successes = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+            self.in_flight_limit = min(self.max_in_flight, self.in_flight_limit + 1)
+
+class RequestJob:
+    def __init__(self, priority, method, url, kwargs):
+        self.priority = priority
+        self.method = method
+        self.url = url
+        self.host = urlsplit(url).netloc
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempt = 0
+
+class RequestScheduler:
+    """Shared request scheduler with per-host rate limits, retries and priorities.
+
+    Requests from any thread are queued by priority (lower runs first, so
+    INTERACTIVE jumps ahead of BATCH) and run on a fixed pool of worker
+    threads over one pooled session. Each host gets its own adaptive token
+    bucket. 429 and 5xx responses and connection errors are retried with
+    jittered exponential backoff, or after Retry-After when the server
+    sends one.
+
+    client(priority) returns an object with a session-style get(), so the
+    scheduler can be handed to anything in this repo that takes a session.
+    """
+
+    def __init__(self, rate=4.0, burst=4, max_in_flight=4, host_rates=None, workers=8,
+                 max_retries=5, backoff_base=0.5, backoff_cap=30.0, session=None):
+        from pagination import create_session
+
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.host_rates = host_rates or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = session or create_session(workers)
+        self.own_session = session is None
+        self.hosts = {}
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failed': 0}
+        self._ready = []
+        self._delayed = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def limiter(self, host):
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            rate = self.host_rates.get(host, self.rate)
+            limiter = self.hosts[host] = HostLimiter(rate, self.burst, self.max_in_flight)
+        return limiter
+
+    def submit(self, url, priority=BATCH, method='GET', **kwargs):
+        """Queue a request and return a Future of its response"""
+        job = RequestJob(priority, method, url, kwargs)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            heapq.heappush(self._ready, (priority, next(self._order), job))
+            self._condition.notify()
+        return job.future
+
+    def get(self, url, priority=BATCH, **kwargs):
+        """Blocking GET through the scheduler"""
+        return self.submit(url, priority, **kwargs).result()
+
+    def client(self, priority=BATCH):
+        return SchedulerClient(self, priority)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        if self.own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_job(self):
+        """Highest-priority job that may run now, waiting for one if necessary"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, job = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (job.priority, next(self._order), job))
+
+                # Tokens are only taken when a request can start, so a newly
+                # queued interactive request gets the very next free token
+                blocked = []
+                job = None
+                wake_at = self._delayed[0][0] if self._delayed else None
+                while self._ready:
+                    entry = heapq.heappop(self._ready)
+                    limiter = self.limiter(entry[2].host)
+                    if limiter.in_flight < limiter.in_flight_limit:
+                        wait = limiter.acquire(now)
+                        if not wait:
+                            job = entry[2]
+                            limiter.in_flight += 1
+                            break
+                        wake_at = now + wait if wake_at is None else min(wake_at, now + wait)
+                    blocked.append(entry)
+                for entry in blocked:
+                    heapq.heappush(self._ready, entry)
+
+                if job is not None:
+                    return job
+                if self._closed and not self._ready and not self._delayed:
+                    return None
+                self._condition.wait(wake_at - now if wake_at is not None else None)
+
+    def _work(self):
+        import requests
+
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            response = error = None
+            try:
+                response = self.session.request(job.method, job.url, **job.kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except Exception as e:
+                with self._condition:
+                    self.hosts[job.host].in_flight -= 1
+                    self._condition.notify_all()
+                self._finish(job, error=e)
+                continue
+
+            now = time.monotonic()
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            with self._condition:
+                self.stats['requests'] += 1
+                limiter = self.hosts[job.host]
+                limiter.in_flight -= 1
+                if not retryable:
+                    limiter.succeeded()
+                else:
+                    retry_after = None
+                    if response is not None:
+                        retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+                        if response.status_code == 429:
+                            self.stats['throttled'] += 1
+                    limiter.throttled(now, retry_after)
+                    if job.attempt < self.max_retries:
+                        delay = retry_after
+                        if delay is None:
+                            delay = backoff_delay(job.attempt, self.backoff_base, self.backoff_cap)
+                        job.attempt += 1
+                        self.stats['retries'] += 1
+                        if response is not None:
+                            response.close()
+                        heapq.heappush(self._delayed, (now + delay, next(self._order), job))
+                        self._condition.notify_all()
+                        continue
+                    self.stats['failed'] += 1
+                self._condition.notify_all()
+            # Success, or out of retries: hand back the last response (or error) as it is
+            self._finish(job, response, error)
+
+    def _finish(self, job, response=None, error=None):
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(response)
+
+class SchedulerClient:
+    """Session-like view of a scheduler that sends every request at one priority"""
+
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def get(self, url, **kwargs):
+        return self.scheduler.get(url, self.priority, **kwargs)
+
+    def close(self):
+        """Leave the shared scheduler running"""
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl
+
+from extraction_plan import schema_fingerprint
+
+DEFAULT_REGISTRY_PATH = '.schema_registry.json'
+DEFAULT_SAMPLE_SIZE = 5
+MAX_DRIFT_EVENTS = 20
+
+# Query parameters that page through an endpoint without changing its shape
+PAGING_PARAMS = {'format', 'limit', 'offset'}
+
+def endpoint_pattern(url):
+    """Registry key for an endpoint: numbers in the path and query values are wildcards"""
+    parts = urlsplit(url)
+    path = re.sub(r'/\d+(?=/|\.|$)', '/{n}', parts.path)
+    keys = sorted({k for k, _ in parse_qsl(parts.query)} - PAGING_PARAMS)
+    return f"{parts.netloc}{path}" + (f"?{'&'.join(keys)}" if keys else '')
+
+def sample_document(data, sample_size=DEFAULT_SAMPLE_SIZE):
+    """Copy of data keeping at most sample_size evenly spaced items of every array"""
+    if isinstance(data, dict):
+        return {key: sample_document(value, sample_size) for key, value in data.items()}
+    if isinstance(data, list):
+        if len(data) > sample_size:
+            step = (len(data) - 1) / (sample_size - 1) if sample_size > 1 else len(data)
+            data = [data[round(i * step)] for i in range(sample_size)]
+        return [sample_document(item, sample_size) for item in data]
+    return data
+
+def schema_types(schema):
+    types = schema.get('type', [])
+    return {types} if isinstance(types, str) else set(types)
+
+def alternatives(schema):
+    return schema.get('anyOf', [schema]) if isinstance(schema, dict) else []
+
+def schema_drift(sample, registered, path='$'):
+    """Differences of a sample's schema that the registered schema does not already allow"""
+    changes = []
+    for option in alternatives(sample):
+        types = schema_types(option)
+        if 'integer' in types:
+            types = types | {'number'}
+        match = next((candidate for candidate in alternatives(registered)
+                      if schema_types(candidate) & types), None)
+        if match is None:
+            changes.append(f"{path}: new type {'/'.join(sorted(schema_types(option)))}")
+            continue
+
+        missing_types = schema_types(option) - schema_types(match)
+        if 'number' in schema_types(match):
+            missing_types.discard('integer')
+        if missing_types:
+            changes.append(f"{path}: new type {'/'.join(sorted(missing_types))}")
+
+        properties = match.get('properties', {})
+        for name, subschema in option.get('properties', {}).items():
+            if name not in properties:
+                changes.append(f"{path}.{name}: new property")
+            else:
+                changes.extend(schema_drift(subschema, properties[name], f"{path}.{name}"))
+        for name in set(match.get('required', [])) - set(option.get('required', [])):
+            if 'properties' in option:
+                changes.append(f"{path}.{name}: no longer always present")
+        if isinstance(option.get('items'), dict):
+            if isinstance(match.get('items'), dict):
+                changes.extend(schema_drift(option['items'], match['items'], f"{path}[]"))
+            elif option['items']:
+                # Registered from an empty array, which says nothing about its items
+                changes.append(f"{path}[]: new items")
+    return changes
+
+def without_required(schema):
+    """Copy of a schema with every required list dropped"""
+    if isinstance(schema, list):
+        return [without_required(option) for option in schema]
+    if not isinstance(schema, dict):
+        return schema
+    stripped = {key: without_required(value) for key, value in schema.items()
+                if key not in ('required', 'properties')}
+    if 'properties' in schema:
+        # Keys here are field names, so a field called 'required' stays
+        stripped['properties'] = {name: without_required(subschema)
+                                  for name, subschema in schema['properties'].items()}
+    return stripped
+
+class SchemaRegistry:
+    """Persisted schema per endpoint pattern, so full inference only runs on drift.
+
+    Each response is checked by inferring a schema from a small sample of
+    it. When the registered schema already covers the sample, the
+    registered schema is reused without its required lists, since the
+    sample cannot vouch for the items it skipped, and with it the
+    extraction plan cached for its fingerprint. Otherwise the response is
+    inferred in full, merged into the registered schema and a drift event
+    is recorded. Fields that only appear outside the sample are missed
+    until a later sample includes them.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, sample_size=DEFAULT_SAMPLE_SIZE):
+        self.path = path
+        self.sample_size = sample_size
+        self.stats = {'reused': 0, 'registered': 0, 'drifted': 0}
+        self._reused_schemas = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def save(self):
+        with open(f'{self.path}.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def drift_events(self, url):
+        """Recorded drift events of an endpoint's pattern, oldest first"""
+        return self.entries.get(endpoint_pattern(url), {}).get('drift_events', [])
+
+    def resolve(self, url, data, instrumentation=None):
+        """Schema for a response of url, inferring it in full only when it drifted"""
+        from genson import SchemaBuilder
+
+        pattern = endpoint_pattern(url)
+        with self._lock:
+            entry = self.entries.get(pattern)
+        if entry is not None:
+            sample_builder = SchemaBuilder()
+            sample_builder.add_object(sample_document(data, self.sample_size))
+            changes = schema_drift(sample_builder.to_schema(), entry['schema'])
+            if not changes:
+                with self._lock:
+                    self.stats['reused'] += 1
+                    reused = self._reused_schemas.get(entry['fingerprint'])
+                    if reused is None:
+                        reused = self._reused_schemas[entry['fingerprint']] = without_required(
+                            entry['schema'])
+                return reused
+
+        builder = SchemaBuilder()
+        if entry is not None:
+            builder.add_schema(entry['schema'])
+        builder.add_object(data)
+        schema = builder.to_schema()
+
+        with self._lock:
+            if entry is None:
+                self.stats['registered'] += 1
+                entry = self.entries[pattern] = {'drift_events': []}
+                print(f"📝 Registered schema for {pattern}")
+            else:
+                self.stats['drifted'] += 1
+                entry['drift_events'] = (entry['drift_events'] + [{
+                    'time': datetime.now(timezone.utc).isoformat(),
+                    'previous_fingerprint': entry['fingerprint'],
+                    'changes': changes,
+                }])[-MAX_DRIFT_EVENTS:]
+                print(f"⚠️ Schema drift on {pattern}: {'; '.join(changes)}")
+                if instrumentation is not None:
+                    instrumentation.count('schema_drift', endpoint=url)
+            entry['schema'] = schema
+            entry['fingerprint'] = schema_fingerprint(schema)
+            self.save()
+        return schema
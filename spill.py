@@ -0,0 +1,238 @@
+import itertools
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import weakref
+
+from columnar import ColumnarTable, ObjectColumn
+
+# Rows a table appends between two checks of the memory budget
+DEFAULT_CHECK_EVERY = 1024
+
+def resolve_column_class(classes):
+    """Buffer class for a column whose chunks used classes; mixed types become objects"""
+    classes = set(classes)
+    return classes.pop() if len(classes) == 1 else ObjectColumn
+
+def as_class(column, cls):
+    return column if type(column) is cls else ObjectColumn(column.to_objects())
+
+class SpillStore:
+    """Memory budget shared by the tables of one processor.
+
+    Every check_every rows a table asks the store to compare the estimated
+    size of all buffered rows with the budget. Once it is exceeded, the
+    largest tables are written out as on-disk chunks until the buffers are
+    back under half the budget. Chunks live in a temporary directory (under
+    directory when given) that is removed once the store and every view
+    reading from it are gone.
+    """
+
+    def __init__(self, memory_budget, directory=None, check_every=DEFAULT_CHECK_EVERY):
+        self.memory_budget = memory_budget
+        self.check_every = check_every
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='spill-', dir=directory)
+        self.tables = []
+        self.stats = {'spills': 0, 'spilled_rows': 0}
+        self._chunk_ids = itertools.count()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def table(self, name, column_types=None):
+        """New table buffer that spills into this store"""
+        table = SpillingTable(self, name, column_types)
+        self.tables.append(table)
+        return table
+
+    def chunk_path(self, name):
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        return os.path.join(self.directory, f'{safe_name}-{next(self._chunk_ids)}.chunk')
+
+    def check(self):
+        """Spill the largest tables while the buffers are over budget"""
+        sizes = [(table.nbytes(), table) for table in self.tables]
+        total = sum(size for size, _ in sizes)
+        if total <= self.memory_budget:
+            return
+        for size, table in sorted(sizes, key=lambda item: -item[0]):
+            # A table with a half-built row (a parent interning a dimension) waits for the next check
+            if not table.num_rows or table.in_row():
+                continue
+            table.spill()
+            total -= size
+            if total <= self.memory_budget // 2:
+                break
+
+    def cleanup(self):
+        """Delete the chunk files now instead of when the store is collected"""
+        self._finalizer()
+
+class SpillingTable(ColumnarTable):
+    """ColumnarTable whose finished rows can be moved to on-disk chunks.
+
+    len() counts spilled and buffered rows together, so entity counts and
+    keys are the same as without a budget.
+    """
+
+    def __init__(self, store, name, column_types=None):
+        super().__init__(column_types)
+        self.store = store
+        self.name = name
+        self.chunks = []
+        self.spilled_rows = 0
+        self.unchecked_rows = 0
+
+    def __len__(self):
+        return self.spilled_rows + self.num_rows
+
+    def end_row(self):
+        ColumnarTable.end_row(self)
+        self.unchecked_rows += 1
+        if self.unchecked_rows >= self.store.check_every:
+            self.unchecked_rows = 0
+            self.store.check()
+
+    def spill(self):
+        """Write the buffered rows to a chunk file and start empty buffers"""
+        path = self.store.chunk_path(self.name)
+        with open(path, 'wb') as f:
+            pickle.dump(self.columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunks.append((path, self.num_rows,
+                            {name: type(column) for name, column in self.columns.items()}))
+        self.store.stats['spills'] += 1
+        self.store.stats['spilled_rows'] += self.num_rows
+        self.spilled_rows += self.num_rows
+        self.columns = {}
+        self.num_rows = 0
+
+    def view(self):
+        """Spill what is still buffered and return a lazy view of every chunk"""
+        if self.num_rows:
+            self.spill()
+        return ChunkedTable(self.store, list(self.chunks), self.column_types)
+
+    def to_frame(self):
+        if not self.chunks:
+            return ColumnarTable.to_frame(self)
+        return self.view().to_frame()
+
+class ChunkedTable:
+    """Lazily concatenated view of a spilled table.
+
+    Nothing is read until asked for: iter_frames() loads one chunk at a
+    time, to_frame() concatenates all of them, and head() stops at the
+    chunks it needs. Columns missing from a chunk are filled with nulls, and
+    a column whose type changed between chunks becomes an object column, as
+    it would in a single buffer.
+    """
+
+    def __init__(self, store, chunks, column_types=None, transform=None):
+        self.store = store
+        self.chunks = chunks
+        self.column_types = column_types or {}
+        self.transform = transform
+        self.classes = {}
+        for _, _, classes in chunks:
+            for name, cls in classes.items():
+                self.classes.setdefault(name, set()).add(cls)
+
+    @property
+    def columns(self):
+        return list(self.classes)
+
+    def __len__(self):
+        return sum(num_rows for _, num_rows, _ in self.chunks)
+
+    @property
+    def shape(self):
+        return (len(self), len(self.classes))
+
+    def __repr__(self):
+        return f"<ChunkedTable {len(self)} rows x {len(self.classes)} columns in {len(self.chunks)} chunks>"
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.to_frame([key])[key]
+        return self.to_frame(list(key))
+
+    def map_frames(self, func):
+        """View that applies func to every DataFrame it produces"""
+        transform = func if self.transform is None else (lambda df: func(self.transform(df)))
+        return ChunkedTable(self.store, self.chunks, self.column_types, transform)
+
+    def column_class(self, name):
+        return resolve_column_class(self.classes[name])
+
+    def null_column(self, name, count):
+        column = self.column_class(name)()
+        column.extend_nulls(count)
+        return column
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def build_frame(self, columns, start, num_rows):
+        import pandas as pd
+
+        df = pd.DataFrame({name: column.to_array() for name, column in columns.items()},
+                          index=pd.RangeIndex(start, start + num_rows))
+        return self.transform(df) if self.transform is not None else df
+
+    def iter_frames(self, columns=None):
+        """One DataFrame per chunk, with the same columns and a continuing index"""
+        names = columns or self.columns
+        start = 0
+        for path, num_rows, _ in self.chunks:
+            chunk = self.load(path)
+            aligned = {}
+            for name in names:
+                column = chunk.get(name)
+                if column is None:
+                    aligned[name] = self.null_column(name, num_rows)
+                else:
+                    aligned[name] = as_class(column, self.column_class(name))
+            yield self.build_frame(aligned, start, num_rows)
+            start += num_rows
+
+    def to_frame(self, columns=None):
+        """Load every chunk into one DataFrame"""
+        names = columns or self.columns
+        merged = {name: self.column_class(name)() for name in names}
+        for path, num_rows, _ in self.chunks:
+            chunk = self.load(path)
+            for name, column in merged.items():
+                if name in chunk:
+                    column.extend(as_class(chunk[name], type(column)))
+                else:
+                    column.extend_nulls(num_rows)
+        return self.build_frame(merged, 0, len(self))
+
+    def head(self, n=5):
+        import pandas as pd
+
+        frames = []
+        remaining = n
+        for df in self.iter_frames():
+            frames.append(df.head(remaining))
+            remaining -= len(frames[-1])
+            if remaining <= 0:
+                break
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+def table_frames(table):
+    """DataFrames of a result table: one per chunk when it was spilled, else the table itself"""
+    if isinstance(table, ChunkedTable):
+        return table.iter_frames()
+    return iter([table])
+
+def as_frame(table):
+    """A result table as one DataFrame, loading every chunk of a spilled table"""
+    if isinstance(table, ChunkedTable):
+        return table.to_frame()
+    return table
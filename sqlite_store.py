@@ -0,0 +1,116 @@
+import itertools
+import sqlite3
+
+import pandas as pd
+
+from spill import table_frames
+
+# Schema types from the extraction plan mapped to SQLite column affinities
+SQLITE_TYPES = {
+    'integer': 'INTEGER',
+    'number': 'REAL',
+    'boolean': 'INTEGER',
+}
+
+def quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def column_affinity(df, column, declared=None):
+    """SQLite type for a column, from the plan's schema type or else the dtype"""
+    if declared in SQLITE_TYPES:
+        return SQLITE_TYPES[declared]
+    dtype = df[column].dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+def create_table_sql(name, df, relationships, column_types=None):
+    """CREATE TABLE statement with the surrogate key and foreign key constraints"""
+    column_types = column_types or {}
+    definitions = []
+    for column in df.columns:
+        if column == 'id':
+            definitions.append('"id" INTEGER PRIMARY KEY')
+        else:
+            affinity = column_affinity(df, column, column_types.get(column))
+            definitions.append(f'{quote(column)} {affinity}')
+    for relationship in relationships:
+        if relationship['child'] == name and relationship['foreign_key'] in df.columns:
+            definitions.append(f"FOREIGN KEY ({quote(relationship['foreign_key'])}) "
+                               f"REFERENCES {quote(relationship['parent'])} (\"id\")")
+    return f'CREATE TABLE IF NOT EXISTS {quote(name)} (\n    ' + ',\n    '.join(definitions) + '\n)'
+
+def sqlite_values(series):
+    """Column values SQLite can bind: dates as ISO text, durations as seconds"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.dt.strftime('%Y-%m-%d')
+    if pd.api.types.is_timedelta64_dtype(series.dtype):
+        return series.dt.total_seconds()
+    return series
+
+def table_rows(df):
+    """Row tuples of plain Python values, nulls as None"""
+    columns = []
+    for column in df.columns:
+        values = sqlite_values(df[column])
+        columns.append(values.astype(object).where(values.notna(), None).tolist())
+    return zip(*columns)
+
+def write_sqlite(result, path, column_types=None, mode='replace'):
+    """Load a relational result into a SQLite database.
+
+    DDL comes from the plan's column types (falling back to the DataFrame
+    dtypes) and the relationship list. Every table is bulk-inserted with
+    executemany inside one transaction, and indexes on the foreign key
+    columns are built once the data is in. Spilled tables are inserted one
+    chunk at a time.
+    """
+    if mode not in ('replace', 'append'):
+        raise ValueError(f"Unknown write mode: {mode}")
+    column_types = column_types or {}
+    relationships = result['relationships']
+    counts = {}
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute('BEGIN')
+        for name, table in result['tables'].items():
+            frames = table_frames(table)
+            df = next(frames)
+            if mode == 'replace':
+                conn.execute(f'DROP TABLE IF EXISTS {quote(name)}')
+            conn.execute(create_table_sql(name, df, relationships, column_types.get(name)))
+            placeholders = ', '.join('?' for _ in df.columns)
+            columns = ', '.join(quote(column) for column in df.columns)
+            for frame in itertools.chain([df], frames):
+                conn.executemany(f'INSERT INTO {quote(name)} ({columns}) VALUES ({placeholders})',
+                                 table_rows(frame))
+            counts[name] = len(table)
+
+        for relationship in relationships:
+            child, foreign_key = relationship['child'], relationship['foreign_key']
+            if child in result['tables'] and foreign_key in result['tables'][child].columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {quote(f"idx_{child}_{foreign_key}")} '
+                             f'ON {quote(child)} ({quote(foreign_key)})')
+        conn.execute('COMMIT')
+        conn.execute('ANALYZE')
+    except sqlite3.Error:
+        # ANALYZE runs after the COMMIT, when there is nothing left to roll back
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    print(f"✅ Loaded {sum(counts.values())} rows into {len(counts)} SQLite tables")
+    return counts
+
+def query_sqlite(path, sql, params=()):
+    """Run a query against a loaded database and return only its result as a DataFrame"""
+    conn = sqlite3.connect(path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
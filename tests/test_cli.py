@@ -0,0 +1,27 @@
+import cli
+
+def test_fetch_shares_cache_entries_with_the_relational_path(server, tmp_path, capsysbinary):
+    server.routes['/f1/2024.json'] = lambda request: (
+        200, {'Content-Type': 'application/json', 'Cache-Control': 'max-age=60'}, b'{"MRData": {}}')
+    url = server.url('/f1/2024.json')
+
+    cli.main(['fetch', url, '--cache-dir', str(tmp_path)])
+    cli.main(['fetch', url, '--cache-dir', str(tmp_path)])
+
+    assert capsysbinary.readouterr().out == b'{"MRData": {}}\n' * 2
+    assert [path for path, _ in server.requests] == ['/f1/2024.json?format=json']
+
+def test_fetch_rejects_non_json_from_the_cache_too(server, tmp_path, capsysbinary):
+    server.routes['/page'] = lambda request: (200, {'Content-Type': 'text/html'}, b'<html></html>')
+
+    for _ in range(2):
+        assert cli.main(['fetch', server.url('/page'), '--cache-dir', str(tmp_path)]) == 1
+        captured = capsysbinary.readouterr()
+        assert captured.out == b''
+        assert 'Unexpected content type: text/html' in captured.err.decode()
+
+def test_fetch_reports_http_errors(server, capsys):
+    server.routes['/missing'] = lambda request: (404, {'Content-Type': 'application/json'}, b'{}')
+
+    assert cli.main(['fetch', server.url('/missing')]) == 1
+    assert capsys.readouterr().err.startswith('❌ Fetch failed: 404')
@@ -0,0 +1,16 @@
+from columnar import ColumnarTable, IntColumn, ObjectColumn
+
+def test_integer_beyond_int64_falls_back_to_objects():
+    table = ColumnarTable({'gameId': 'integer'})
+    for value in (1, 2 ** 70, None):
+        table.append_row({'gameId': value})
+
+    assert type(table.columns['gameId']) is ObjectColumn
+    assert table.to_frame()['gameId'].tolist() == [1, 2 ** 70, None]
+
+def test_mixed_types_fall_back_to_objects():
+    table = ColumnarTable({'position': 'integer'})
+    table.append_row({'position': 1})
+    assert type(table.columns['position']) is IntColumn
+    table.append_row({'position': 'R'})
+    assert table.columns['position'].to_objects() == [1, 'R']
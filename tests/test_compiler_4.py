@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from compiler_4 import (extract_data_from_json, find_all_lists, flatten_nested_dict,
+                        generate_schema, get_parent_context)
+
+FIXTURES = sorted((Path(__file__).parent.parent / 'fixtures').glob('*.json'))
+
+def merged_rows(data, list_paths):
+    """Rows as extract_data_from_json built them before FlatRows: one merged dict per item"""
+    rows = []
+
+    def extract_recursive(data, parent_context=None):
+        parent_context = parent_context or {}
+        if isinstance(data, list):
+            for item in data:
+                if isinstance(item, dict):
+                    merged = {**parent_context, **flatten_nested_dict(item)}
+                    rows.append(merged)
+                    for value in item.values():
+                        extract_recursive(value, merged)
+        elif isinstance(data, dict):
+            for value in data.values():
+                extract_recursive(value, parent_context)
+
+    for path in list_paths:
+        current = data
+        for key in path.split('.'):
+            current = current.get(key, {}) if isinstance(current, dict) else current
+        if isinstance(current, list):
+            extract_recursive(current, get_parent_context(data, path))
+    if not list_paths:
+        extract_recursive(data)
+    return rows
+
+@pytest.mark.parametrize('fixture', FIXTURES, ids=lambda path: path.stem)
+def test_flat_rows_match_merged_dicts(fixture):
+    data = json.loads(fixture.read_text())
+    list_paths = find_all_lists(generate_schema(data))
+    expected = pd.DataFrame(merged_rows(data, list_paths))
+
+    extracted = extract_data_from_json(data, list_paths)
+    assert len(extracted) == len(expected)
+    assert_frame_equal(extracted.to_frame(), expected)
+
+    # Requested columns come out in the order asked for
+    columns = list(expected.columns[::-3])
+    assert_frame_equal(extracted.to_frame(columns), expected[columns])
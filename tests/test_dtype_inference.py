@@ -0,0 +1,49 @@
+import pandas as pd
+
+from compiler_5 import RelationalProcessor
+from spill import as_frame, table_frames
+from sqlite_store import write_sqlite
+
+def results_document(races):
+    return {'MRData': {'RaceTable': {'Races': [{
+        'round': str(r + 1), 'date': f'2024-03-{r % 28 + 1:02d}',
+        # Too many distinct values for categories
+        'url': f'https://en.wikipedia.org/wiki/Race_{r}',
+        'Results': [{
+            # Early races are all classified; later ones have retirements
+            'position': str(p) if r < races - 5 or p < 15 else 'R',
+            'points': str(p * 1000 if r == races - 1 else p),
+            'grid': str(p) if p != 3 or r < races - 5 else None,
+            'status': 'Finished',
+            'Driver': {'driverId': f'driver_{r}_{p}' if p != 20 else None},
+        } for p in range(1, 21)],
+    } for r in range(races)]}}}
+
+def processed(**options):
+    processor = RelationalProcessor(validation='off', infer_dtypes=True, **options)
+    return processor, processor.process_data(results_document(60))
+
+def test_spilled_chunks_share_one_dtype_per_column():
+    _, result = processed(memory_budget=20_000)
+    results = result['tables']['Results']
+    frames = list(table_frames(results))
+    assert len(frames) > 1
+    for column in frames[0].columns:
+        assert len({str(df[column].dtype) for df in frames}) == 1, column
+
+def test_spilled_dtypes_match_in_memory_dtypes():
+    _, expected = processed()
+    _, spilled = processed(memory_budget=20_000)
+    for name, df in expected['tables'].items():
+        frame = as_frame(spilled['tables'][name])
+        pd.testing.assert_series_equal(frame.dtypes, df.dtypes, obj=name)
+        pd.testing.assert_frame_equal(frame, df, obj=name)
+
+def test_sqlite_types_come_from_the_unified_dtypes(tmp_path):
+    processor, result = processed(memory_budget=20_000)
+    write_sqlite(result, str(tmp_path / 'results.db'), processor.column_types)
+    import sqlite3
+    with sqlite3.connect(tmp_path / 'results.db') as conn:
+        columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info("Results")')}
+    assert columns['points'] == 'INTEGER'
+    assert columns['position'] == 'TEXT'
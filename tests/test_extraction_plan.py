@@ -0,0 +1,17 @@
+import json
+
+from extraction_plan import Projection, get_extraction_plan
+
+SCHEMA = {'type': 'object', 'properties': {'Races': {'type': 'array', 'items': {
+    'type': 'object', 'properties': {'round': {'type': 'string'}, 'raceName': {'type': 'string'}}}}}}
+
+def test_plans_are_shared_per_schema_mode_and_projection():
+    plan = get_extraction_plan(SCHEMA)
+    # An equal schema built elsewhere has the same fingerprint
+    assert get_extraction_plan(json.loads(json.dumps(SCHEMA))) is plan
+
+    normalized = get_extraction_plan(SCHEMA, normalize=True)
+    projected = get_extraction_plan(SCHEMA, projection=Projection(['Races.round']))
+    assert len({id(plan), id(normalized), id(projected)}) == 3
+    # Projections selecting the same columns share a plan
+    assert get_extraction_plan(SCHEMA, projection=Projection({'Races': ['round']})) is projected
@@ -0,0 +1,47 @@
+from http_cache import ResponseCache
+
+JSON = {'Content-Type': 'application/json'}
+
+def test_stale_entry_is_revalidated_with_its_etag(server, tmp_path):
+    def races(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {**JSON, 'ETag': '"v1"'}, b'{"round": 1}'
+    server.routes['/f1/2024/races.json'] = races
+    # Every entry is stale at once, so the second fetch has to ask the server
+    cache = ResponseCache(str(tmp_path), ttl_rules=[], default_ttl=0)
+
+    first = cache.fetch(server.url('/f1/2024/races.json'))
+    second = cache.fetch(server.url('/f1/2024/races.json'))
+
+    assert first == second == (b'{"round": 1}', 'application/json')
+    assert [headers.get('If-None-Match') for _, headers in server.requests] == [None, '"v1"']
+    assert cache.stats == {'hits': 0, 'misses': 1, 'revalidated': 1, 'evictions': 0}
+
+def test_fresh_entry_is_served_from_disk(server, tmp_path):
+    server.routes['/f1/seasons.json'] = lambda request: (200, JSON, b'[]')
+    cache = ResponseCache(str(tmp_path), ttl_rules=[])
+
+    cache.fetch(server.url('/f1/seasons.json?offset=0&limit=30'))
+    # Same URL with the query in another order
+    cache.fetch(server.url('/f1/seasons.json?limit=30&offset=0'))
+
+    assert len(server.requests) == 1
+    assert cache.stats['hits'] == 1
+
+def test_least_recently_used_entries_are_evicted_past_the_size_limit(server, tmp_path):
+    for name in 'abc':
+        server.routes[f'/{name}.json'] = lambda request: (200, JSON, b'x' * 100)
+    cache = ResponseCache(str(tmp_path), max_bytes=250, ttl_rules=[])
+
+    cache.fetch(server.url('/a.json'))
+    cache.fetch(server.url('/b.json'))
+    # Reading a again leaves b as the least recently used entry
+    cache.fetch(server.url('/a.json'))
+    cache.fetch(server.url('/c.json'))
+
+    assert cache.size() == 200
+    assert cache.stats['evictions'] == 1
+    cache.fetch(server.url('/a.json'))
+    cache.fetch(server.url('/b.json'))
+    assert [path for path, _ in server.requests] == ['/a.json', '/b.json', '/c.json', '/b.json']
@@ -0,0 +1,40 @@
+import json
+
+from compiler_5 import fetch_api_data
+from incremental import ErgastRoundWatermark
+
+JSON = {'Content-Type': 'application/json'}
+
+def races_response(races):
+    return (200, JSON, json.dumps({'MRData': {'RaceTable': {'Races': races}}}).encode())
+
+def race(number, **fields):
+    return {'season': '2024', 'round': str(number), **fields}
+
+def test_rounds_without_data_do_not_end_the_refresh(server):
+    server.routes['/f1/2024.json'] = lambda request: races_response([race(n) for n in (1, 2, 3, 4)])
+    # No sprint in rounds 1 and 3
+    sprints = {2: [race(2, SprintResults=[{'position': '1'}])],
+               4: [race(4, SprintResults=[{'position': '1'}])]}
+    for number in (1, 2, 3, 4):
+        server.routes[f'/f1/2024/{number}/sprint.json'] = (
+            lambda request, number=number: races_response(sprints.get(number, [])))
+
+    watermark = ErgastRoundWatermark()
+    documents = list(watermark.newer_documents(server.url('/f1/2024/sprint.json'), None,
+                                               fetch_api_data))
+
+    assert [watermark.watermark_of(data) for data in documents] == [(2024, 2), (2024, 4)]
+    # One schedule lookup, then only the rounds of the season
+    assert len(server.requests) == 5
+
+def test_refresh_starts_after_the_watermark(server):
+    server.routes['/f1/2024.json'] = lambda request: races_response([race(n) for n in (1, 2, 3)])
+    server.routes['/f1/2024/3/results.json'] = lambda request: races_response([race(3)])
+
+    documents = list(ErgastRoundWatermark().newer_documents(
+        server.url('/f1/2024/results.json'), (2024, 2), fetch_api_data))
+
+    assert len(documents) == 1
+    assert [path.split('?')[0] for path, _ in server.requests] == [
+        '/f1/2024.json', '/f1/2024/3/results.json']
@@ -0,0 +1,62 @@
+import json
+import tracemalloc
+
+import pytest
+
+from compiler_5 import RelationalProcessor
+from instrumentation import StageProfiler
+
+JSON = {'Content-Type': 'application/json'}
+STAGES = ['fetch', 'schema', 'validate', 'analyze', 'convert', 'structure']
+
+def races_body(rounds):
+    return json.dumps({'MRData': {'RaceTable': {'Races': [
+        {'round': str(r), 'Results': [{'position': str(p)} for p in range(3)]}
+        for r in range(rounds)]}}}).encode()
+
+def test_profiler_collects_stages_and_counters_per_endpoint(server):
+    server.routes['/2023.json'] = lambda request: (200, JSON, races_body(2))
+    server.routes['/2024.json'] = lambda request: (200, JSON, races_body(4))
+    profiler = StageProfiler()
+    processor = RelationalProcessor(instrumentation=profiler)
+    for season in ('2023', '2024'):
+        processor.process_api_response(server.url(f'/{season}.json'))
+
+    endpoints = profiler.to_dict()['endpoints']
+    assert list(endpoints) == [server.url('/2023.json'), server.url('/2024.json')]
+    profile = endpoints[server.url('/2024.json')]
+    assert list(profile['stages']) == STAGES
+    for stats in profile['stages'].values():
+        assert stats['calls'] == 1
+        assert stats['seconds'] >= 0
+        assert stats['peak_bytes'] is None
+    # Only the rows added by this endpoint are counted against it
+    assert profile['counters']['entities'] == {'Races': 4, 'Results': 12}
+    assert profile['counters']['bytes_fetched'] == len(races_body(4))
+    assert endpoints[server.url('/2023.json')]['counters']['entities'] == {'Races': 2, 'Results': 6}
+
+def test_stage_hooks_time_failing_stages_too():
+    profiler = StageProfiler()
+    with pytest.raises(ValueError):
+        with profiler.stage('convert', 'races'):
+            raise ValueError('bad row')
+    profiler.count('validation_errors', 3, endpoint='races')
+    profiler.count('validation_errors', endpoint='races')
+
+    profile = profiler.to_dict()['endpoints']['races']
+    assert profile['stages']['convert']['calls'] == 1
+    assert profile['counters'] == {'validation_errors': 4}
+    assert 'convert' in profiler.report() and 'validation_errors: 4' in profiler.report()
+
+def test_traced_stages_record_their_memory_peak():
+    profiler = StageProfiler(trace_memory=True)
+    try:
+        with profiler.stage('convert'):
+            buffer = bytearray(4 * 1024 * 1024)
+        del buffer
+    finally:
+        # Tracing would slow down every test after this one
+        tracemalloc.stop()
+
+    stats = profiler.to_dict()['endpoints']['document']['stages']['convert']
+    assert stats['peak_bytes'] >= 4 * 1024 * 1024
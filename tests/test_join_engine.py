@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from compiler_5 import RelationalProcessor
+from join_engine import JoinEngine
+
+def races_document():
+    return {'MRData': {'RaceTable': {'Races': [{
+        'season': '2024', 'round': str(r), 'raceName': f'GP {r}', 'date': f'2024-03-0{r}',
+        'Results': [{'position': str(p), 'points': str(10 - p),
+                     'Driver': {'driverId': f'd{p}', 'familyName': f'F{p}'}} for p in (1, 2, 3)],
+    } for r in (1, 2, 3)]}}}
+
+def processed(**options):
+    return RelationalProcessor(validation='off', **options).process_data(races_document())
+
+SELECT = ['Races.raceName', 'Driver.familyName', 'Results.position']
+
+@pytest.mark.parametrize('infer_dtypes', [False, True])
+@pytest.mark.parametrize('normalize', [False, True])
+def test_string_filters_match_any_column_dtype(infer_dtypes, normalize):
+    engine = JoinEngine(processed(infer_dtypes=infer_dtypes, normalize=normalize))
+    # As parsed from --where Races.round=2 Results.position=1,2
+    joined = engine.join(SELECT, {'Races.round': ['2'], 'Results.position': ['1', '2']})
+    assert joined['Races.raceName'].tolist() == ['GP 2', 'GP 2']
+    assert sorted(joined['Driver.familyName']) == ['F1', 'F2']
+    assert len(engine.join(SELECT, {'Races.round': 2})) == 3
+
+def test_date_filter_on_inferred_dates():
+    engine = JoinEngine(processed(infer_dtypes=True))
+    joined = engine.join(['Races.raceName'], {'Races.date': '2024-03-03'})
+    assert joined['Races.raceName'].tolist() == ['GP 3']
+
+@pytest.mark.parametrize('index_kind', ['hash', 'sorted'])
+def test_join_matches_a_merge_chain(index_kind):
+    result = processed(normalize=True)
+    tables = result['tables']
+    expected = (tables['Results'].merge(tables['Driver'], left_on='Driver_id', right_on='id')
+                .merge(tables['Races'], left_on='Races_id', right_on='id'))
+    expected = expected[['raceName', 'familyName', 'position']].set_axis(SELECT, axis=1)
+
+    engine = JoinEngine(result, index_kind)
+    joined = engine.join(SELECT)
+    engine.join(SELECT)
+
+    pd.testing.assert_frame_equal(joined.sort_values(SELECT).reset_index(drop=True),
+                                  expected.sort_values(SELECT).reset_index(drop=True))
+    assert engine.stats['indexes_built'] == 2 and engine.stats['index_reuses'] == 2
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+import json_backend
+
+FIXTURES = sorted((Path(__file__).parent.parent / 'fixtures').glob('*.json'))
+
+@pytest.fixture
+def without_orjson(monkeypatch):
+    """json_backend as it behaves when neither orjson nor ujson is installed"""
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    monkeypatch.setitem(sys.modules, 'ujson', None)
+    monkeypatch.setattr(json_backend, '_backend', None)
+
+def test_fallback_is_the_stdlib(without_orjson):
+    assert json_backend.available_backends() == ['stdlib']
+    assert json_backend.backend_name() == 'stdlib'
+
+@pytest.mark.parametrize('fixture', FIXTURES, ids=lambda path: path.stem)
+def test_stdlib_fallback_matches_orjson(fixture, monkeypatch):
+    orjson = pytest.importorskip('orjson')
+    body = fixture.read_bytes()
+    document = orjson.loads(body)
+
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    monkeypatch.setitem(sys.modules, 'ujson', None)
+    monkeypatch.setattr(json_backend, '_backend', None)
+    assert json_backend.loads(body) == document
+    assert json_backend.dumps(document) == orjson.dumps(document)
+
+def test_stdlib_fallback_keeps_non_ascii_text(without_orjson):
+    document = {'givenName': 'Sergio', 'familyName': 'Pérez', 'locality': 'São Paulo'}
+    expected = '{"givenName":"Sergio","familyName":"Pérez","locality":"São Paulo"}'
+    assert json_backend.dumps(document) == expected.encode()
+    assert json_backend.loads(json_backend.dumps(document)) == document
@@ -0,0 +1,18 @@
+import json
+
+from json_stream import StructureIndex
+
+def items(index, start):
+    bounds = index.bounds(start).tolist()
+    return [json.loads(index.body[a + 1:b]) for a, b in zip(bounds, bounds[1:])]
+
+def test_structure_index_skips_brackets_and_commas_inside_strings():
+    document = {'Races': [{'raceName': 'GP "1" [a, b]', 'url': 'C:\\\\'}, [], {}, '\\"', 7],
+                'RaceTable': {}}
+    for body in (json.dumps(document).encode(), json.dumps(document, indent=2).encode()):
+        index = StructureIndex(body)
+        races = index.member(index.value_start(0), 'Races')
+
+        assert items(index, races) == document['Races']
+        assert items(index, index.member(0, 'RaceTable')) == []
+        assert index.member(0, 'Laps') is None
@@ -0,0 +1,12 @@
+from lru import LRUCache
+
+def test_least_recently_used_entry_is_dropped_past_max_size():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    # b was the least recently used, so it went and a stayed
+    assert len(cache) == 2
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
@@ -0,0 +1,46 @@
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+from pagination import extend_records, fetch_all_pages
+
+JSON = {'Content-Type': 'application/json'}
+# Results per race, 14 rows in all
+RESULTS = {1: 5, 2: 5, 3: 4}
+PAGE_LIMIT = 7
+
+def result_rows():
+    return [(race, position) for race, count in RESULTS.items()
+            for position in range(1, count + 1)]
+
+def results_page(request):
+    """Ergast-style page of result rows, grouped by race, capped at PAGE_LIMIT rows"""
+    query = dict(parse_qsl(urlsplit(request.path).query))
+    limit, offset = min(int(query['limit']), PAGE_LIMIT), int(query['offset'])
+    races = []
+    for race, position in result_rows()[offset:offset + limit]:
+        if not races or races[-1]['round'] != str(race):
+            races.append({'season': '2024', 'round': str(race), 'Results': []})
+        races[-1]['Results'].append({'position': str(position)})
+    document = {'MRData': {'limit': str(limit), 'offset': str(offset),
+                           'total': str(len(result_rows())),
+                           'RaceTable': {'season': '2024', 'Races': races}}}
+    return 200, JSON, json.dumps(document).encode()
+
+def test_race_split_across_pages_is_rejoined(server):
+    server.routes['/f1/2024/results.json'] = results_page
+
+    data = fetch_all_pages(server.url('/f1/2024/results.json'), max_workers=2)
+
+    races = data['MRData']['RaceTable']['Races']
+    assert [race['round'] for race in races] == ['1', '2', '3']
+    assert [[r['position'] for r in race['Results']] for race in races] == [
+        [str(p) for p in range(1, count + 1)] for count in RESULTS.values()]
+    assert data['MRData']['limit'] == '14'
+    # The server capped the first page at 7 rows, so one more page was enough
+    offsets = sorted(dict(parse_qsl(urlsplit(path).query))['offset'] for path, _ in server.requests)
+    assert offsets == ['0', '7']
+
+def test_races_meeting_at_a_page_boundary_stay_apart():
+    records = [{'round': '1', 'Results': [{'position': '1'}]}]
+    extend_records(records, [{'round': '2', 'Results': [{'position': '1'}]}])
+    assert [race['round'] for race in records] == ['1', '2']
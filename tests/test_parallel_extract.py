@@ -0,0 +1,104 @@
+import json
+
+import pandas as pd
+import pytest
+
+import parallel_extract
+from compiler_5 import RelationalProcessor
+
+def results_document(races, results, laps=0, lap_info=True):
+    """Ergast-style results: Time hangs off both Results and FastestLap, Info0 sits on every level"""
+    info = lambda i: {'source': 'ergast', 'revision': i % 50}
+    document = []
+    for r in range(races):
+        document.append({
+            'season': '2024', 'round': str(r + 1), 'raceName': f'GP "{r}" \\', 'Info0': info(r),
+            'Circuit': {'circuitId': f'c{r % 5}', 'Location': {'country': f'C{r % 3}'}},
+            'Laps': [{'number': str(n + 1), **({'Info0': info(r * laps + n)} if lap_info else {}),
+                      'Timings': [{'driverId': f'd{i}', 'position': str(i + 1)} for i in range(3)]}
+                     for n in range(laps)],
+            'Results': [{
+                'position': str(i + 1), 'points': str(max(0, 10 - i)), 'Info0': info(i + 1),
+                'Driver': {'driverId': f'd{i}', 'nationality': 'Dutch' if i % 2 else 'British'},
+                # Finishers have a race time, lapped drivers only a status
+                **({'Time': {'millis': str(5_000_000 + i), 'time': f'+{i}.0'}} if i < results // 2
+                   else {'status': '+1 Lap'}),
+                'FastestLap': {'rank': str(i + 1), 'lap': str(40 + i), 'Time': {'time': f'1:3{i % 10}.0'}},
+            } for i in range(results)],
+        })
+    return {'MRData': {'RaceTable': {'season': '2024', 'Races': document}}}
+
+def extract(document, **options):
+    processor = RelationalProcessor(validation='off', **options)
+    # Workers get slices of the body, so whitespace and escapes have to survive the cut
+    body = json.dumps(document, indent=1).encode()
+    return processor, processor.process_data(json.loads(body), body)
+
+def assert_same_output(document, monkeypatch, **options):
+    sequential, expected = extract(document, **options)
+    monkeypatch.setattr(parallel_extract, 'MIN_PARALLEL_ROWS', 0)
+    parallel, result = extract(document, extract_workers=2, **options)
+
+    assert result['relationships'] == expected['relationships']
+    assert list(result['tables']) == list(expected['tables'])
+    for name, df in expected['tables'].items():
+        pd.testing.assert_frame_equal(result['tables'][name], df, obj=name)
+    assert dict(parallel.last_keys) == dict(sequential.last_keys)
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_many_races_match_sequential(monkeypatch, normalize):
+    assert_same_output(results_document(races=40, results=10), monkeypatch, normalize=normalize)
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_short_array_sharing_tables_with_its_laps_matches_sequential(monkeypatch, normalize):
+    # Too few races to split, and Info0 rows come from both races and laps
+    assert_same_output(results_document(races=3, results=10, laps=60), monkeypatch,
+                       normalize=normalize)
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_laps_are_split_below_the_stored_races(monkeypatch, normalize):
+    split_paths = []
+    iter_tasks = parallel_extract.iter_tasks
+
+    def recording_iter_tasks(*args):
+        for path, task in iter_tasks(*args):
+            split_paths.append(path)
+            yield path, task
+
+    monkeypatch.setattr(parallel_extract, 'iter_tasks', recording_iter_tasks)
+    assert_same_output(results_document(races=3, results=10, laps=60, lap_info=False), monkeypatch,
+                       normalize=normalize)
+    assert split_paths and all(path[-1] == 'Laps' for path in split_paths)
+
+def test_rows_with_a_null_parent_key_are_kept(monkeypatch):
+    monkeypatch.setattr(parallel_extract, 'MIN_PARALLEL_ROWS', 0)
+    _, result = extract(results_document(races=20, results=10), extract_workers=2)
+    times = result['tables']['Time']
+    assert times['Results_id'].notna().sum() == 20 * 5
+    assert times['FastestLap_id'].notna().sum() == 20 * 10
+
+def test_projection_matches_sequential(monkeypatch):
+    assert_same_output(results_document(races=40, results=10), monkeypatch,
+                       projection=['Results.Driver.driverId'])
+
+def test_fetched_body_is_sliced_for_the_workers(monkeypatch, server):
+    document = results_document(races=40, results=10)
+    server.routes['/f1/2024/results.json'] = lambda request: (
+        200, {'Content-Type': 'application/json'}, json.dumps(document).encode())
+    _, expected = extract(document)
+    monkeypatch.setattr(parallel_extract, 'MIN_PARALLEL_ROWS', 0)
+    payloads = []
+    write_task = parallel_extract.write_task
+
+    def recording_write_task(body, task):
+        shm, size = write_task(body, task)
+        payloads.append(bytes(shm.buf[:size]))
+        return shm, size
+
+    monkeypatch.setattr(parallel_extract, 'write_task', recording_write_task)
+    result = RelationalProcessor(validation='off', extract_workers=2).process_api_response(
+        server.url('/f1/2024/results.json'))
+
+    assert payloads
+    for name, df in expected['tables'].items():
+        pd.testing.assert_frame_equal(result['tables'][name], df, obj=name)
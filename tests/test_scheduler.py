@@ -0,0 +1,52 @@
+import threading
+import time
+
+from scheduler import BATCH, INTERACTIVE, RequestScheduler
+
+JSON = {'Content-Type': 'application/json'}
+
+def test_throttling_and_server_errors_are_retried(server):
+    replies = iter([(429, {'Retry-After': '0'}, b''), (503, {}, b''), (200, JSON, b'{}')])
+    server.routes['/f1/2024.json'] = lambda request: next(replies)
+
+    with RequestScheduler(rate=100, burst=10, workers=1, backoff_base=0.01) as scheduler:
+        response = scheduler.get(server.url('/f1/2024.json'))
+
+    assert response.status_code == 200
+    assert len(server.requests) == 3
+    assert scheduler.stats == {'requests': 3, 'retries': 2, 'throttled': 1, 'failed': 0}
+
+def test_last_response_is_returned_once_retries_run_out(server):
+    server.routes['/f1/2024.json'] = lambda request: (502, {}, b'')
+
+    with RequestScheduler(rate=100, burst=10, workers=1, max_retries=2,
+                          backoff_base=0.01) as scheduler:
+        response = scheduler.get(server.url('/f1/2024.json'))
+
+    assert response.status_code == 502
+    assert len(server.requests) == 3
+    assert scheduler.stats['failed'] == 1
+
+def test_interactive_requests_run_before_queued_batch_requests(server):
+    release = threading.Event()
+    def slow(request):
+        release.wait(5)
+        return 200, JSON, b'{}'
+    server.routes['/slow.json'] = slow
+    for name in ('batch-1', 'batch-2', 'interactive'):
+        server.routes[f'/{name}.json'] = lambda request: (200, JSON, b'{}')
+
+    with RequestScheduler(rate=100, burst=10, workers=1) as scheduler:
+        futures = [scheduler.submit(server.url('/slow.json'))]
+        # Hold the only worker so the rest of the requests queue up behind it
+        while not server.requests:
+            time.sleep(0.01)
+        futures += [scheduler.submit(server.url('/batch-1.json'), BATCH),
+                    scheduler.submit(server.url('/batch-2.json'), BATCH),
+                    scheduler.submit(server.url('/interactive.json'), INTERACTIVE)]
+        release.set()
+        for future in futures:
+            assert future.result().status_code == 200
+
+    assert [path for path, _ in server.requests] == [
+        '/slow.json', '/interactive.json', '/batch-1.json', '/batch-2.json']
@@ -0,0 +1,51 @@
+from schema_registry import SchemaRegistry, without_required
+
+URL = 'https://api.jolpi.ca/ergast/f1/2024/5/results.json'
+
+def races_document(races):
+    return {'MRData': {'RaceTable': {'round': '5', 'Races': races}}}
+
+def test_items_after_an_empty_array_count_as_drift(tmp_path):
+    registry = SchemaRegistry(str(tmp_path / 'registry.json'))
+    registry.resolve(URL, races_document([]))
+
+    schema = registry.resolve(URL, races_document([{'raceName': 'Miami', 'round': '6'}]))
+
+    assert registry.stats == {'reused': 0, 'registered': 1, 'drifted': 1}
+    races = schema['properties']['MRData']['properties']['RaceTable']['properties']['Races']
+    assert 'raceName' in races['items']['properties']
+    assert registry.drift_events(URL)[-1]['changes'] == ['$.MRData.RaceTable.Races[]: new items']
+
+def test_unchanged_shape_reuses_the_registered_schema(tmp_path):
+    registry = SchemaRegistry(str(tmp_path / 'registry.json'))
+    registry.resolve(URL, races_document([{'raceName': 'Miami'}]))
+    reused = registry.resolve(URL, races_document([{'raceName': 'Imola'}]))
+    # The same schema object each time, so the extraction plan is reused with it
+    assert registry.resolve(URL, races_document([{'raceName': 'Monaco'}])) is reused
+    assert registry.stats['reused'] == 2
+
+def results_document(times):
+    results = [{'position': str(n + 1), **({'Time': {'millis': str(5000000 + n)}} if timed else {})}
+               for n, timed in enumerate(times)]
+    return races_document([{'raceName': 'Miami', 'Results': results}])
+
+def test_field_missing_outside_the_sample_does_not_fail_validation(tmp_path):
+    from compiler_5 import RelationalProcessor
+
+    registry = SchemaRegistry(str(tmp_path / 'registry.json'))
+    registry.resolve(URL, results_document([True] * 20))
+    processor = RelationalProcessor(schema_registry=registry)
+    processor.endpoint = URL
+
+    # Evenly spaced sampling of 20 results never looks at item 17
+    result = processor.process_data(results_document([n != 17 for n in range(20)]))
+
+    assert registry.stats == {'reused': 1, 'registered': 1, 'drifted': 0}
+    assert result is not None
+    assert len(result['tables']['Time']) == 19
+
+def test_required_lists_are_dropped_but_fields_named_required_stay():
+    schema = {'type': 'object', 'required': ['required'], 'properties': {
+        'required': {'type': 'object', 'required': ['a'], 'properties': {'a': {'type': 'string'}}}}}
+    assert without_required(schema) == {'type': 'object', 'properties': {
+        'required': {'type': 'object', 'properties': {'a': {'type': 'string'}}}}}
@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+import sqlite_store
+from compiler_5 import RelationalProcessor
+from sqlite_store import create_table_sql, query_sqlite, write_sqlite
+
+DOCUMENT = {'MRData': {'RaceTable': {'Races': [{
+    'round': str(r + 1), 'Results': [{'position': str(p + 1), 'points': 25 - p}
+                                     for p in range(3)],
+} for r in range(2)]}}}
+
+def loaded(tmp_path):
+    processor = RelationalProcessor(validation='off')
+    result = processor.process_data(DOCUMENT)
+    path = str(tmp_path / 'races.db')
+    return processor, result, path
+
+def test_ddl_declares_keys_and_types(tmp_path):
+    processor, result, path = loaded(tmp_path)
+    write_sqlite(result, path, processor.column_types)
+
+    with sqlite3.connect(path) as conn:
+        columns = {row[1]: (row[2], row[5]) for row in conn.execute('PRAGMA table_info("Results")')}
+        foreign_keys = [(row[2], row[3], row[4])
+                        for row in conn.execute('PRAGMA foreign_key_list("Results")')]
+        indexes = {row[1]: [info[2] for info in conn.execute(f'PRAGMA index_info("{row[1]}")')]
+                   for row in conn.execute('PRAGMA index_list("Results")')}
+
+    # The surrogate key is the primary key; values declared integer by the plan stay integer
+    assert columns['id'] == ('INTEGER', 1)
+    assert columns['points'] == ('INTEGER', 0)
+    assert columns['position'] == ('TEXT', 0)
+    assert columns['Races_id'] == ('INTEGER', 0)
+    assert foreign_keys == [('Races', 'Races_id', 'id')]
+    assert indexes == {'idx_Results_Races_id': ['Races_id']}
+
+def test_create_table_sql_without_declared_types():
+    import pandas as pd
+
+    df = pd.DataFrame({'id': [1], 'lap': [1.5], 'name': ['x'], 'Races_id': [1]})
+    relationships = [{'parent': 'Races', 'child': 'Laps', 'foreign_key': 'Races_id'}]
+    assert create_table_sql('Laps', df, relationships) == (
+        'CREATE TABLE IF NOT EXISTS "Laps" (\n'
+        '    "id" INTEGER PRIMARY KEY,\n'
+        '    "lap" REAL,\n'
+        '    "name" TEXT,\n'
+        '    "Races_id" INTEGER,\n'
+        '    FOREIGN KEY ("Races_id") REFERENCES "Races" ("id")\n'
+        ')')
+
+def test_rows_join_through_the_foreign_key(tmp_path):
+    processor, result, path = loaded(tmp_path)
+    counts = write_sqlite(result, path, processor.column_types)
+
+    assert counts == {name: len(df) for name, df in result['tables'].items()}
+    joined = query_sqlite(path, 'SELECT r."round", COUNT(*) AS results FROM "Results" s '
+                                'JOIN "Races" r ON s."Races_id" = r."id" GROUP BY r."round"')
+    assert joined['results'].tolist() == [3, 3]
+
+class FailingAnalyze:
+    """Connection whose ANALYZE fails after the data is committed"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        if sql == 'ANALYZE':
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def test_failed_analyze_raises_its_own_error(tmp_path, monkeypatch):
+    processor, result, path = loaded(tmp_path)
+    connect = sqlite3.connect
+    monkeypatch.setattr(sqlite_store.sqlite3, 'connect',
+                        lambda *args, **kwargs: FailingAnalyze(connect(*args, **kwargs)))
+
+    with pytest.raises(sqlite3.OperationalError, match='database is locked'):
+        write_sqlite(result, path, processor.column_types)
+    monkeypatch.undo()
+    # The load itself was committed before ANALYZE ran
+    assert query_sqlite(path, 'SELECT COUNT(*) AS n FROM "Results"')['n'].tolist() == [6]
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from compiler_5 import RelationalProcessor, generate_schema
+
+JSON = {'Content-Type': 'application/json'}
+
+def test_root_array_streams_into_the_root_table(server):
+    games = [{'gameId': i, 'wpm': 80 + i, 'accuracy': 0.97} for i in range(3)]
+    server.routes['/games'] = lambda request: (200, JSON, json.dumps(games).encode())
+
+    result = RelationalProcessor().process_api_stream(server.url('/games'))
+
+    root = result['tables']['root']
+    assert root['gameId'].tolist() == [0, 1, 2]
+    assert root['id'].tolist() == [1, 2, 3]
+
+def test_truncated_stream_is_a_failure(server):
+    body = json.dumps({'MRData': {'Races': [{'round': str(i)} for i in range(100)]}}).encode()
+    # Promise the whole body but hang up halfway through
+    server.routes['/races'] = lambda request: (
+        200, {**JSON, 'Content-Length': str(len(body))}, body[:len(body) // 2])
+
+    assert RelationalProcessor().process_api_stream(server.url('/races')) is None
+
+def results_document():
+    """Time hangs off both Results and FastestLap, so each of its key columns has gaps"""
+    return {'MRData': {'RaceTable': {'season': '2024', 'Races': [{
+        'round': str(r + 1), 'Circuit': {'circuitId': f'c{r}'},
+        'Results': [{
+            'position': str(p + 1),
+            **({'Time': {'millis': str(5_000_000 + p)}} if p < 2 else {'status': '+1 Lap'}),
+            'FastestLap': {'lap': str(40 + p), 'Time': {'time': f'1:3{p}.0'}},
+        } for p in range(4)],
+    } for r in range(3)]}}}
+
+@pytest.mark.parametrize('planned', [False, True])
+def test_streamed_tables_match_the_loaded_document(server, planned):
+    from pandas.testing import assert_frame_equal
+
+    document = results_document()
+    server.routes['/f1/2024/results.json'] = lambda request: (
+        200, JSON, json.dumps(document).encode())
+    expected = RelationalProcessor(validation='off').process_data(document)
+
+    processor = RelationalProcessor()
+    if planned:
+        processor.analyze_schema(generate_schema(document))
+    # Small batches fill up for the child tables before their parents finish
+    result = processor.process_api_stream(server.url('/f1/2024/results.json'), batch_size=2)
+
+    assert list(result['tables']) == list(expected['tables'])
+    assert result['relationships'] == expected['relationships']
+    for name, df in expected['tables'].items():
+        assert_frame_equal(result['tables'][name], df, obj=name)
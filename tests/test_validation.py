@@ -0,0 +1,60 @@
+import pytest
+
+from compiler_5 import RelationalProcessor, validate_data
+from validation import SampledValidator, error_path, iter_validation_errors
+
+SCHEMA = {'type': 'object', 'properties': {'Races': {'type': 'array', 'items': {
+    'type': 'object', 'properties': {
+        'round': {'type': 'string'},
+        'Circuit': {'type': 'object', 'properties': {'circuitId': {'type': 'string'}}},
+    }}}}}
+
+def races(count, bad=()):
+    """Races whose rounds are numbers instead of strings at the bad indices"""
+    return {'Races': [{'round': i if i in bad else str(i), 'Circuit': {'circuitId': f'c{i}'}}
+                      for i in range(count)]}
+
+def test_sampled_run_only_checks_sampled_items():
+    validator = SampledValidator(SCHEMA, sample_size=5, seed=0)
+    sampled = sorted(validator.rng.sample(range(50), 5))
+    unsampled = next(i for i in range(50) if i not in sampled)
+
+    validator = SampledValidator(SCHEMA, sample_size=5, seed=0)
+    assert list(validator.iter_errors(races(50, bad={unsampled}))) == []
+    validator = SampledValidator(SCHEMA, sample_size=5, seed=0)
+    errors = list(validator.iter_errors(races(50, bad={sampled[0]})))
+    assert [error_path(e) for e in errors] == [f'Races.{sampled[0]}.round']
+
+def test_strict_catches_every_item():
+    errors = list(iter_validation_errors(races(50, bad={7, 41}), SCHEMA, 'strict'))
+    assert sorted(error_path(e) for e in errors) == ['Races.41.round', 'Races.7.round']
+
+def test_sampled_errors_carry_their_document_path():
+    document = races(3)
+    document['Races'][1]['Circuit']['circuitId'] = 1
+    errors = list(iter_validation_errors(document, SCHEMA, 'sampled'))
+    assert [error_path(e) for e in errors] == ['Races.1.Circuit.circuitId']
+    assert error_path(errors[0]) == '.'.join(str(p) for p in errors[0].absolute_path)
+
+@pytest.mark.parametrize('level,expected', [('off', 0), ('sampled', 1), ('strict', 1)])
+def test_validation_levels(level, expected):
+    errors = list(iter_validation_errors(races(3, bad={2}), SCHEMA, level))
+    assert len(errors) == expected
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        iter_validation_errors(races(1), SCHEMA, 'lenient')
+
+def test_reference_schema_rejects_documents_the_inferred_one_accepts():
+    document = races(3, bad={1})
+    assert RelationalProcessor(validation='strict').process_data(document) is not None
+
+    processor = RelationalProcessor(validation='strict', reference_schema=SCHEMA)
+    assert processor.process_data(document) is None
+
+def test_reported_errors_are_capped(capsys):
+    assert not validate_data(races(30, bad=set(range(30))), SCHEMA, max_reported=3)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len([line for line in lines if line.startswith('❌ Validation error')]) == 3
+    assert lines[-1] == '❌ ... 27 more validation errors'
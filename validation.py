@@ -0,0 +1,113 @@
+import random
+
+from extraction_plan import schema_fingerprint
+from lru import LRUCache
+
+VALIDATION_LEVELS = ('off', 'sampled', 'strict')
+DEFAULT_SAMPLE_SIZE = 20
+MAX_CACHED_VALIDATORS = 64
+
+# Compiled validators by (schema fingerprint, level, sample size), reused across pages and processors
+_validator_cache = LRUCache(MAX_CACHED_VALIDATORS)
+
+# Keywords whose subschemas are walked by SampledValidator rather than checked in place
+CONTAINER_KEYWORDS = ('properties', 'items')
+
+def compile_schema(schema, cls=None):
+    """Check a schema once and build a jsonschema validator for it.
+
+    cls defaults to the validator matching the schema's $schema dialect.
+    """
+    from jsonschema.validators import validator_for
+
+    cls = cls or validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+def is_container(schema):
+    return isinstance(schema, dict) and any(k in schema for k in CONTAINER_KEYWORDS)
+
+class SampledValidator:
+    """Validate every object level of a document but only a sample of each array's items.
+
+    The schema is split once into nodes: each node's own keywords and
+    scalar properties are compiled into a validator, while nested objects
+    and array items become child nodes. Arrays longer than sample_size are
+    checked on a random sample of their items.
+    """
+
+    def __init__(self, schema, sample_size=DEFAULT_SAMPLE_SIZE, seed=None):
+        from jsonschema.validators import validator_for
+
+        self.sample_size = sample_size
+        self.rng = random.Random(seed)
+        # Every node is checked with the dialect of the whole schema
+        self.cls = validator_for(schema)
+        self.root = self.compile_node(schema)
+
+    def compile_node(self, schema):
+        if not is_container(schema):
+            return {'validator': compile_schema(schema, self.cls), 'properties': {}, 'items': None}
+
+        shallow = {k: v for k, v in schema.items() if k not in CONTAINER_KEYWORDS}
+        properties = {}
+        if 'properties' in schema:
+            shallow['properties'] = {}
+            for name, subschema in schema['properties'].items():
+                if is_container(subschema):
+                    properties[name] = self.compile_node(subschema)
+                    # Keep the name and type here; the child node checks the contents
+                    shallow['properties'][name] = ({'type': subschema['type']}
+                                                   if 'type' in subschema else {})
+                else:
+                    shallow['properties'][name] = subschema
+        items = schema.get('items')
+        return {
+            'validator': compile_schema(shallow, self.cls),
+            'properties': properties,
+            'items': self.compile_node(items) if isinstance(items, dict) else None,
+        }
+
+    def iter_errors(self, instance):
+        """Yield the errors of the checked part of instance, as they are found"""
+        yield from self.iter_node_errors(self.root, instance, [])
+
+    def iter_node_errors(self, node, instance, path):
+        for error in node['validator'].iter_errors(instance):
+            error.path.extendleft(reversed(path))
+            yield error
+
+        if isinstance(instance, dict):
+            for name, child in node['properties'].items():
+                if name in instance:
+                    yield from self.iter_node_errors(child, instance[name], path + [name])
+        elif isinstance(instance, list) and node['items'] is not None:
+            indices = range(len(instance))
+            if len(instance) > self.sample_size:
+                indices = sorted(self.rng.sample(indices, self.sample_size))
+            for index in indices:
+                yield from self.iter_node_errors(node['items'], instance[index], path + [index])
+
+def get_validator(schema, level='strict', sample_size=DEFAULT_SAMPLE_SIZE):
+    """Compiled validator for a schema, built once per schema and level"""
+    key = (schema_fingerprint(schema), level, sample_size if level == 'sampled' else None)
+    validator = _validator_cache.get(key)
+    if validator is None:
+        if level == 'sampled':
+            validator = SampledValidator(schema, sample_size)
+        else:
+            validator = compile_schema(schema)
+        _validator_cache.put(key, validator)
+    return validator
+
+def iter_validation_errors(data, schema, level='strict', sample_size=DEFAULT_SAMPLE_SIZE):
+    """Stream the validation errors of data at the given level"""
+    if level not in VALIDATION_LEVELS:
+        raise ValueError(f"Unknown validation level: {level}")
+    if level == 'off':
+        return iter(())
+    return get_validator(schema, level, sample_size).iter_errors(data)
+
+def error_path(error):
+    """Dotted location of an error inside the document"""
+    return '.'.join(str(part) for part in error.absolute_path) or '<root>'